@@ -0,0 +1,479 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import socket
+import ssl
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from queue import Empty
+
+import proxy_checker
+
+
+class FakeProxyFarm:
+    """Local stand-ins for the list server, the test URL and many HTTP/SOCKS4/SOCKS5 proxies
+
+    Every proxy listens on its own 127.0.0.1 port and is assigned a behaviour up front:
+    "good" answers after the configured latency, "drop" accepts and then never answers,
+    "fail" refuses the request at the protocol level, and "dead" has no listener at all.
+    "leaky" HTTP proxies work but add Via and X-Forwarded-For headers, like a transparent proxy.
+
+    The origin serves /echo (the request headers as httpbin-style JSON) and /bytes/N on
+    plain HTTP, and the same paths over HTTPS on tls_port with a self-signed certificate
+    made at start-up (skipped, with tls_port left None, if openssl isn't available).
+    Under /unframed/ the same paths answer without Content-Length, in several pieces,
+    and close the connection to end the body.
+    """
+
+    def __init__(self, per_protocol=300, latency=0.05, jitter=0.02, drop_rate=0.1,
+                 fail_rate=0.1, dead_rate=0.3, seed=1, leak_rate=0.0):
+        self.per_protocol = per_protocol
+        self.latency = latency
+        self.jitter = jitter
+        self.rates = (drop_rate, fail_rate, dead_rate)
+        self.leak_rate = leak_rate
+        self.random = random.Random(seed)
+        self.loop = asyncio.new_event_loop()
+        self.servers = []
+        self.lists = {}
+        self.behaviours = {}
+        self.origin_port = None
+        self.tls_port = None
+        self.cert_dir = tempfile.TemporaryDirectory()
+        self.ca_file = os.path.join(self.cert_dir.name, "cert.pem")
+
+    def start(self):
+        """Start every server on a background event loop"""
+        proxy_checker.raise_fd_limit()
+        self.loop.run_until_complete(self._start())
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Close every server and stop the event loop"""
+        async def close():
+            for server in self.servers:
+                server.close()
+        asyncio.run_coroutine_threadsafe(close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.cert_dir.cleanup()
+
+    @property
+    def origin(self):
+        return f"http://127.0.0.1:{self.origin_port}"
+
+    @property
+    def tls_origin(self):
+        return f"https://localhost:{self.tls_port}" if self.tls_port else None
+
+    def list_urls(self):
+        """Source list URLs keyed by protocol, in the shape of ProxyChecker.urls"""
+        return {proto: f"{self.origin}/lists/{proto}.txt" for proto in self.lists}
+
+    def pick_behaviour(self, proto):
+        drop_rate, fail_rate, dead_rate = self.rates
+        roll = self.random.random()
+        if roll < dead_rate:
+            return "dead"
+        if roll < dead_rate + drop_rate:
+            return "drop"
+        if roll < dead_rate + drop_rate + fail_rate:
+            return "fail"
+        if proto == "http" and self.random.random() < self.leak_rate:
+            return "leaky"
+        return "good"
+
+    def make_certificate(self, key_file):
+        """Write a throwaway self-signed certificate for localhost/127.0.0.1 to ca_file; False if openssl failed"""
+        command = [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+            "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1",
+            "-keyout", key_file, "-out", self.ca_file,
+        ]
+        try:
+            subprocess.run(command, check=True, capture_output=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"No HTTPS origin: could not create a test certificate with openssl ({e})")
+            return False
+        return True
+
+    async def _start(self):
+        origin = await asyncio.start_server(self.handle_origin, "127.0.0.1", 0, backlog=4096)
+        self.origin_port = origin.sockets[0].getsockname()[1]
+        self.servers.append(origin)
+
+        key_file = os.path.join(self.cert_dir.name, "key.pem")
+        if self.make_certificate(key_file):
+            context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            context.load_cert_chain(self.ca_file, key_file)
+            tls_origin = await asyncio.start_server(self.handle_origin, "127.0.0.1", 0, ssl=context, backlog=4096)
+            self.tls_port = tls_origin.sockets[0].getsockname()[1]
+            self.servers.append(tls_origin)
+
+        for proto in ("http", "socks4", "socks5"):
+            entries = []
+            for _ in range(self.per_protocol):
+                behaviour = self.pick_behaviour(proto)
+                if behaviour == "dead":
+                    port = self.unused_port()
+                else:
+                    server = await asyncio.start_server(
+                        lambda r, w, p=proto, b=behaviour: self.handle_proxy(r, w, p, b),
+                        "127.0.0.1", 0, backlog=1024
+                    )
+                    self.servers.append(server)
+                    port = server.sockets[0].getsockname()[1]
+                self.behaviours[(proto, f"127.0.0.1:{port}")] = behaviour
+                entries.append(f"127.0.0.1:{port}")
+            self.lists[proto] = ("\n".join(entries) + "\n").encode()
+
+    @staticmethod
+    def unused_port():
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    async def delay(self):
+        await asyncio.sleep(max(0.0, self.random.gauss(self.latency, self.jitter)))
+
+    async def read_head(self, reader):
+        lines = []
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                return lines
+            lines.append(line)
+
+    async def handle_origin(self, reader, writer):
+        try:
+            while True:
+                head = await self.read_head(reader)
+                if not head:
+                    return
+                target = head[0].split()[1].decode()
+                # Proxies may pass on the absolute form of keep-alive requests after the first
+                path = "/" + target.split("/", 3)[3] if "://" in target else target
+                unframed = path.startswith("/unframed/")
+                if unframed:
+                    path = path[len("/unframed"):]
+                headers = {}
+                for line in head[1:]:
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip()] = value.strip()
+
+                if path.startswith("/lists/"):
+                    body = self.lists.get(path[len("/lists/"):-len(".txt")], b"")
+                elif path == "/echo":
+                    peer = writer.get_extra_info("peername")[0]
+                    body = json.dumps({"origin": peer, "headers": headers}).encode()
+                elif path.startswith("/bytes/"):
+                    body = b"x" * int(path[len("/bytes/"):])
+                else:
+                    body = b"<html><body>benchmark origin</body></html>"
+                if unframed:
+                    writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nConnection: close\r\n\r\n")
+                    piece = len(body) // 8 + 1
+                    for start in range(0, len(body), piece):
+                        writer.write(body[start:start + piece])
+                        await writer.drain()
+                        await asyncio.sleep(0.001)
+                    return
+                keep_alive = headers.get("Connection", "").lower() == "keep-alive"
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\n"
+                    + f"Content-Length: {len(body)}\r\n".encode()
+                    + (b"Connection: keep-alive\r\n\r\n" if keep_alive else b"Connection: close\r\n\r\n")
+                    + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except (ConnectionError, IndexError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def relay(self, reader, writer, first_bytes=b"", port=None):
+        """Pipe the client connection to an origin server port (the plain HTTP one by default)"""
+        origin_reader, origin_writer = await asyncio.open_connection("127.0.0.1", port or self.origin_port)
+        origin_writer.write(first_bytes)
+
+        async def pipe(source, sink):
+            try:
+                while True:
+                    data = await source.read(65536)
+                    if not data:
+                        break
+                    sink.write(data)
+                    await sink.drain()
+            except ConnectionError:
+                pass
+            finally:
+                sink.close()
+
+        await asyncio.gather(pipe(reader, origin_writer), pipe(origin_reader, writer))
+
+    async def handle_proxy(self, reader, writer, proto, behaviour):
+        try:
+            if behaviour == "drop":
+                # Accept and then never answer, like a black-holed proxy
+                await reader.read()
+                return
+
+            if proto == "http":
+                head = await self.read_head(reader)
+                await self.delay()
+                if behaviour == "fail":
+                    writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                    await writer.drain()
+                    return
+                method, target, version = head[0].split()
+                if method == b"CONNECT":
+                    writer.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+                    await writer.drain()
+                    await self.relay(reader, writer, port=int(target.rpartition(b":")[2]))
+                    return
+                path = b"/" + target.split(b"/", 3)[3] if target.count(b"/") >= 3 else b"/"
+                extra = b""
+                if behaviour == "leaky":
+                    peer = writer.get_extra_info("peername")[0]
+                    extra = f"Via: 1.1 benchmark-farm\r\nX-Forwarded-For: {peer}\r\n".encode()
+                await self.relay(reader, writer, b" ".join((method, path, version)) + b"\r\n" + b"".join(head[1:]) + extra + b"\r\n")
+                return
+
+            if proto == "socks4":
+                request = await reader.readexactly(8)
+                await reader.readuntil(b"\x00")
+                await self.delay()
+                if behaviour == "fail":
+                    writer.write(b"\x00\x5b" + request[2:8])
+                    await writer.drain()
+                    return
+                writer.write(b"\x00\x5a" + request[2:8])
+                await writer.drain()
+                await self.relay(reader, writer, port=struct.unpack(">H", request[2:4])[0])
+                return
+
+            greeting = await reader.readexactly(2)
+            await reader.readexactly(greeting[1])
+            writer.write(b"\x05\x00")
+            await writer.drain()
+            request = await reader.readexactly(4)
+            if request[3] == 1:
+                address = await reader.readexactly(6)
+            elif request[3] == 4:
+                address = await reader.readexactly(18)
+            else:
+                address = await reader.readexactly((await reader.readexactly(1))[0] + 2)
+            await self.delay()
+            if behaviour == "fail":
+                writer.write(b"\x05\x05\x00\x01" + bytes(4) + struct.pack(">H", 0))
+                await writer.drain()
+                return
+            writer.write(b"\x05\x00\x00\x01" + bytes(4) + struct.pack(">H", 0))
+            await writer.drain()
+            await self.relay(reader, writer, port=struct.unpack(">H", address[-2:])[0])
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            pass
+        finally:
+            writer.close()
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def run_scenario(engine, workers, urls, test_url, options, results):
+    """Run one checker configuration in this (child) process and report its measurements"""
+    import resource
+
+    sys.stdout = open(os.devnull, "w", encoding="utf-8")
+    checker = proxy_checker.ProxyChecker(interactive=False)
+    checker.urls = urls
+    checker.config.update(
+        test_url=test_url,
+        engine=engine,
+        timeout=options["timeout"],
+        max_proxies=options["proxies"],
+        streaming=options["streaming"],
+        source_cache_dir="",
+        stream_export=False,
+    )
+    if options.get("profile"):
+        checker.config.update(options["profile"], profile=True)
+    if engine == "threads":
+        checker.config["thread_count"] = workers
+    else:
+        checker.config["concurrency"] = workers
+
+    start = time.perf_counter()
+    checker.test_proxies()
+    elapsed = time.perf_counter() - start
+
+    latencies = [record.response_time for record in checker.working_proxies]
+    profiles = [record.profile for record in checker.working_proxies if record.profile]
+    usage_self = resource.getrusage(resource.RUSAGE_SELF)
+    usage_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    results.put({
+        "engine": engine,
+        "workers": workers,
+        "checked": checker.stats["tested"],
+        "working": checker.stats["working"],
+        "seconds": round(elapsed, 3),
+        "checks_per_sec": round(checker.stats["tested"] / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50),
+        "p99_ms": percentile(latencies, 0.99),
+        # ru_maxrss is in KiB on Linux; children are the processes engine's workers
+        "peak_rss_mb": round(max(usage_self.ru_maxrss, usage_children.ru_maxrss) / 1024, 1),
+        "cpu_seconds": round(usage_self.ru_utime + usage_self.ru_stime
+                             + usage_children.ru_utime + usage_children.ru_stime, 2),
+        "profiled": len(profiles),
+        "https": sum(1 for profile in profiles if profile.https),
+        "transparent": sum(1 for profile in profiles if profile.anonymity == "transparent"),
+        "median_score": percentile([profile.score for profile in profiles], 0.50),
+        "median_kbps": percentile([profile.throughput for profile in profiles], 0.50),
+    })
+
+
+def run_bulk_load(path, bulk, results):
+    """Load, dedup and filter a list file in this (child) process, in bulk or line by line"""
+    import resource
+
+    proxy_filter = proxy_checker.ProxyFilter(deny_networks=["10.0.0.0/8"])
+    start = time.perf_counter()
+    index = proxy_checker.ProxyIndex()
+    kept = 0
+    if bulk:
+        # unique() only dedups with NumPy; the index catches what's left, as in fetch_into_queue()
+        packed, _ = proxy_checker.load_proxy_file(path).unique()
+        packed, _ = packed.select(proxy_filter)
+        for line in packed:
+            if index.add(line, "http"):
+                kept += 1
+    else:
+        with open(path, "rb") as f:
+            for raw in f:
+                item = index.add(raw.decode("utf-8", "ignore"), "http")
+                if item and proxy_filter.allows(*proxy_checker.split_proxy(item[1])):
+                    kept += 1
+    elapsed = time.perf_counter() - start
+    results.put({
+        "loader": ("bulk+numpy" if proxy_checker.numpy is not None else "bulk") if bulk else "lines",
+        "seconds": round(elapsed, 3),
+        "kept": kept,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    })
+
+
+def bench_bulk_load(lines, seed):
+    """Compare the bulk loader with line-by-line parsing on a generated list of IPv4:port lines"""
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "list.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            for _ in range(lines):
+                f.write(f"{rng.randrange(1, 224)}.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}"
+                        f":{rng.choice((80, 8080, 3128, 1080, rng.randrange(1, 65536)))}\n")
+        print(f"List: {lines} lines, {os.path.getsize(path) / 1e6:.1f}MB")
+        context = multiprocessing.get_context("spawn")
+        rows = []
+        for bulk in (True, False):
+            results = context.Queue()
+            process = context.Process(target=run_bulk_load, args=(path, bulk, results))
+            process.start()
+            process.join()
+            row = results.get(timeout=1)
+            rows.append(row)
+            print(f"{row['loader']:<12} {row['seconds']:>8.2f}s  kept={row['kept']:<9} rss={row['peak_rss_mb']}MB")
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ProxyChecker engines against a local fake proxy farm")
+    parser.add_argument("--proxies", type=int, default=300, help="proxies per protocol")
+    parser.add_argument("--engines", default="threads,asyncio", help="comma separated: threads,asyncio,processes")
+    parser.add_argument("--workers", default="80", help="comma separated thread counts / async concurrency")
+    parser.add_argument("--latency", type=float, default=0.05, help="mean proxy latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="latency standard deviation in seconds")
+    parser.add_argument("--drop-rate", type=float, default=0.1, help="share of proxies that never answer")
+    parser.add_argument("--fail-rate", type=float, default=0.1, help="share of proxies that refuse requests")
+    parser.add_argument("--dead-rate", type=float, default=0.3, help="share of proxies with nothing listening")
+    parser.add_argument("--timeout", type=float, default=2, help="checker timeout in seconds")
+    parser.add_argument("--batch", action="store_true", help="use the batch pipeline instead of streaming")
+    parser.add_argument("--profile", action="store_true", help="also profile working proxies against the farm origin")
+    parser.add_argument("--unframed", action="store_true",
+                        help="serve the profiling echo and download without Content-Length (for --profile)")
+    parser.add_argument("--leak-rate", type=float, default=0.0, help="share of working HTTP proxies that leak our address (for --profile)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--bulk-lines", type=int, help="only time loading a generated list of this many lines")
+    args = parser.parse_args(argv)
+
+    if args.bulk_lines:
+        rows = bench_bulk_load(args.bulk_lines, args.seed)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"options": vars(args), "results": rows}, f, indent=2)
+        return
+
+    farm = FakeProxyFarm(args.proxies, args.latency, args.jitter, args.drop_rate,
+                         args.fail_rate, args.dead_rate, args.seed, args.leak_rate).start()
+    options = {"timeout": args.timeout, "proxies": args.proxies, "streaming": not args.batch}
+    if args.profile:
+        prefix = farm.origin + ("/unframed" if args.unframed else "")
+        options["profile"] = {
+            "profile_echo_url": prefix + "/echo",
+            "profile_https_url": farm.tls_origin + "/" if farm.tls_origin else "",
+            "profile_download_url": prefix + "/bytes/262144",
+            "profile_real_ip": "127.0.0.1",
+            "tls_ca_file": farm.ca_file,
+        }
+    expected = sum(1 for behaviour in farm.behaviours.values() if behaviour in ("good", "leaky"))
+    print(f"Farm: {len(farm.behaviours)} proxies ({expected} good) behind {farm.origin}")
+
+    # Each scenario runs in a fresh process so RSS and CPU time are its own
+    context = multiprocessing.get_context("spawn")
+    rows = []
+    for engine in args.engines.split(","):
+        for workers in (int(w) for w in args.workers.split(",")):
+            results = context.Queue()
+            process = context.Process(
+                target=run_scenario,
+                args=(engine, workers, farm.list_urls(), farm.origin + "/", options, results)
+            )
+            process.start()
+            process.join()
+            try:
+                row = results.get(timeout=1)
+            except Empty:
+                print(f"{engine:<10} workers={workers:<6} failed (exit code {process.exitcode})")
+                continue
+            rows.append(row)
+            print(f"{row['engine']:<10} workers={row['workers']:<6} "
+                  f"{row['checks_per_sec']:>9.1f} checks/s  "
+                  f"working={row['working']:<6} "
+                  f"p50={row['p50_ms']:.1f}ms p99={row['p99_ms']:.1f}ms  "
+                  f"rss={row['peak_rss_mb']}MB cpu={row['cpu_seconds']}s")
+            if row["profiled"]:
+                print(f"{'':<10} profiled={row['profiled']} https={row['https']} "
+                      f"transparent={row['transparent']} score p50={row['median_score']} "
+                      f"throughput p50={row['median_kbps']}KB/s")
+
+    farm.stop()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"options": vars(args), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
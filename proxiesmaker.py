@@ -17,18 +17,33 @@ headers = {
 
 test_url = "http://example.com"
 
+local = threading.local()
+
+def get_session():
+    # جلسة لكل خيط لإعادة استخدام الاتصالات
+    if not hasattr(local, "session"):
+        local.session = requests.Session()
+        local.session.headers.update(headers)
+    return local.session
+
 def check_proxy(proto, proxy, working):
+    proxy_url = f"{proto}://{proxy}"
     proxies = {
-        "http": f"{proto}://{proxy}",
-        "https": f"{proto}://{proxy}",
+        "http": proxy_url,
+        "https": proxy_url,
     }
+    session = get_session()
     try:
-        r = requests.get(test_url, proxies=proxies, timeout=8, headers=headers)
+        r = session.get(test_url, proxies=proxies, timeout=8)
         if r.status_code == 200:
             print(f"✅ {proto} شغال: {proxy}")
             working.append(proxy)
     except:
         pass
+    finally:
+        manager = session.get_adapter(test_url).proxy_manager.pop(proxy_url, None)
+        if manager is not None:
+            manager.clear()
 
 def worker(proto, q, working):
     while not q.empty():
@@ -36,33 +51,37 @@ def worker(proto, q, working):
         check_proxy(proto, proxy, working)
         q.task_done()
 
-for proto, url in urls.items():
-    try:
-        res = requests.get(url, headers=headers, timeout=15)
-        res.raise_for_status()
-        raw_proxies = res.text.strip().splitlines()
+def main():
+    for proto, url in urls.items():
+        try:
+            res = get_session().get(url, timeout=15)
+            res.raise_for_status()
+            raw_proxies = res.text.strip().splitlines()
+
+            working = []
+            print(f"\n🔍 اختبار بروكسيات {proto} ...")
 
-        working = []
-        print(f"\n🔍 اختبار بروكسيات {proto} ...")
+            q = Queue()
+            for proxy in raw_proxies[:300]:  # نجرب 300 بروكسي
+                q.put(proxy)
 
-        q = Queue()
-        for proxy in raw_proxies[:300]:  # نجرب 300 بروكسي
-            q.put(proxy)
+            threads = []
+            for _ in range(80):
+                t = threading.Thread(target=worker, args=(proto, q, working))
+                t.start()
+                threads.append(t)
 
-        threads = []
-        for _ in range(80):
-            t = threading.Thread(target=worker, args=(proto, q, working))
-            t.start()
-            threads.append(t)
+            for t in threads:
+                t.join()
 
-        for t in threads:
-            t.join()
+            filename = f"{proto}_proxies.txt"
+            with open(filename, "w") as f:
+                f.write("\n".join(working))
 
-        filename = f"{proto}_proxies.txt"
-        with open(filename, "w") as f:
-            f.write("\n".join(working))
+            print(f"📂 تم حفظ {len(working)} بروكسي شغال في {filename}")
 
-        print(f"📂 تم حفظ {len(working)} بروكسي شغال في {filename}")
+        except Exception as e:
+            print(f"❌ خطأ في {proto}: {e}")
 
-    except Exception as e:
-        print(f"❌ خطأ في {proto}: {e}")
+if __name__ == "__main__":
+    main()
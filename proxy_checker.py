@@ -0,0 +1,3347 @@
+import requests
+import argparse
+import csv
+import hashlib
+import base64
+import threading
+import asyncio
+import socket
+import ssl
+import struct
+import ipaddress
+import time
+import os
+import io
+import json
+import re
+import sqlite3
+import sys
+import errno
+import tempfile
+import contextlib
+import heapq
+import multiprocessing
+import mmap
+import weakref
+from array import array
+from bisect import bisect_left
+from collections import deque
+from itertools import accumulate, compress
+from queue import Queue, Empty, Full
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urljoin, urlsplit
+from requests.adapters import HTTPAdapter
+from colorama import Fore, Back, Style, init
+
+try:
+    import numpy
+except ImportError:  # optional: only makes bulk loading of big lists faster
+    numpy = None
+
+# Enable colors on Windows
+init(autoreset=True)
+
+
+PROTOCOLS = ("http", "socks4", "socks5")
+
+PROTOCOL_ALIASES = {
+    "http": "http",
+    "https": "http",
+    "socks4": "socks4",
+    "socks4a": "socks4",
+    "socks5": "socks5",
+    "socks5h": "socks5",
+}
+
+IPV4_RE = re.compile(r"^(25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)(\.(25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)){3}$")
+# Dotted or single-label names; the last label needs a letter so bad IPv4 addresses don't pass
+HOSTNAME_RE = re.compile(
+    r"^(?=.{1,253}$)([a-z0-9]([a-z0-9-]{0,61}[a-z0-9])?\.)*(?=[a-z0-9-]*[a-z])[a-z0-9]([a-z0-9-]{0,61}[a-z0-9])?$"
+)
+
+
+# Redirects the asyncio engine follows, like requests does for the threads engine
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 30
+
+
+class ProxyHandshakeError(Exception):
+    """Raised when a proxy refuses or garbles the protocol handshake"""
+
+
+def parse_target(url):
+    """Split a URL into scheme, host, port and request path"""
+    parts = urlsplit(url)
+    scheme = parts.scheme or "http"
+    port = parts.port or (443 if scheme == "https" else 80)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    return scheme, parts.hostname, port, path
+
+
+def normalize_proxy(line, default_proto):
+    """Parse a list entry into a (host, port, protocol, userinfo) key, or None if it is malformed
+
+    userinfo is the "user:pass" before an "@", kept as written, or "" for open proxies.
+    """
+    entry = line.strip()
+    proto = default_proto
+    if "://" in entry:
+        scheme, _, entry = entry.partition("://")
+        proto = PROTOCOL_ALIASES.get(scheme.lower())
+        if proto is None:
+            return None
+
+    # Drop trailing comments or extra columns and a trailing slash
+    entry = entry.split(None, 1)[0].rstrip("/") if entry else ""
+    userinfo, at, entry = entry.rpartition("@")
+    if at and not userinfo:
+        return None
+    host, sep, port = entry.rpartition(":")
+    if not sep or not port.isdigit():
+        return None
+    port = int(port)
+    if not 0 < port < 65536:
+        return None
+
+    host = host.lower()
+    if host.startswith("[") and host.endswith("]"):
+        try:
+            host = f"[{ipaddress.IPv6Address(host[1:-1]).compressed}]"
+        except ValueError:
+            return None
+    elif not (IPV4_RE.match(host) or HOSTNAME_RE.match(host)):
+        return None
+    return host, port, proto, userinfo
+
+
+class ProxyIndex:
+    """Set index that drops duplicate and malformed entries across all sources"""
+
+    def __init__(self, across_protocols=False):
+        self.across_protocols = across_protocols
+        self.seen = set()
+        self.duplicates = 0
+        self.malformed = 0
+        self.lock = threading.Lock()
+
+    def add(self, line, default_proto):
+        """Return (protocol, "[userinfo@]host:port") for a new entry, or None if it should be skipped"""
+        if not line.strip():
+            return None
+        key = normalize_proxy(line, default_proto)
+        with self.lock:
+            if key is None:
+                self.malformed += 1
+                return None
+            host, port, proto, userinfo = key
+            index_key = (host, port, userinfo) if self.across_protocols else key
+            if index_key in self.seen:
+                self.duplicates += 1
+                return None
+            self.seen.add(index_key)
+        return proto, f"{userinfo}@{host}:{port}" if userinfo else f"{host}:{port}"
+
+
+# Bytes the bulk loader parses at a time, cut at a line end
+BULK_CHUNK_BYTES = 256 * 1024
+
+BULK_OCTET = rb"(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)"
+# A bare IPv4:port line (groups 1 and 2), or any other entry that isn't a comment (group 3)
+BULK_LINE_RE = re.compile(
+    rb"^[ \t]*(?:(" + BULK_OCTET + rb"(?:\." + BULK_OCTET + rb"){3}):(\d{1,5})|([^\s#][^\r\n]*?))[ \t\r]*$",
+    re.M,
+)
+
+
+class ProxyFilter:
+    """Allow/deny rules by CIDR network and port, for single entries or packed IPv4 arrays"""
+
+    def __init__(self, allow_networks=(), deny_networks=(), ports=()):
+        self.allow = [ipaddress.ip_network(network, strict=False) for network in allow_networks]
+        self.deny = [ipaddress.ip_network(network, strict=False) for network in deny_networks]
+        self.ports = frozenset(int(port) for port in ports)
+        if any(not 0 < port < 65536 for port in self.ports):
+            raise ValueError(f"ports must be between 1 and 65535, got {sorted(self.ports)}")
+        # (netmask, network) integer pairs for testing packed addresses
+        self.allow_v4 = [(int(n.netmask), int(n.network_address)) for n in self.allow if n.version == 4]
+        self.deny_v4 = [(int(n.netmask), int(n.network_address)) for n in self.deny if n.version == 4]
+
+    @classmethod
+    def from_config(cls, config):
+        """Build the filter from allow_networks, deny_networks and allow_ports, or None if all are empty"""
+        if not (config["allow_networks"] or config["deny_networks"] or config["allow_ports"]):
+            return None
+        return cls(config["allow_networks"], config["deny_networks"], config["allow_ports"])
+
+    def allows(self, host, port):
+        if self.ports and port not in self.ports:
+            return False
+        if not (self.allow or self.deny):
+            return True
+        try:
+            ip = ipaddress.ip_address(host)
+        except ValueError:
+            # A hostname can't be placed in a network, so only an allow list turns it away
+            return not self.allow
+        if any(ip in network for network in self.deny):
+            return False
+        return not self.allow or any(ip in network for network in self.allow)
+
+    def allows_ipv4(self, ip, port):
+        """allows() for a packed IPv4 address"""
+        if self.ports and port not in self.ports:
+            return False
+        if any(ip & mask == network for mask, network in self.deny_v4):
+            return False
+        return not self.allow or any(ip & mask == network for mask, network in self.allow_v4)
+
+    def mask(self, ips, ports):
+        """Vectorized allows_ipv4() over NumPy arrays, returning a boolean keep mask"""
+        keep = numpy.ones(len(ips), dtype=bool)
+        if self.ports:
+            keep &= numpy.isin(ports, numpy.array(sorted(self.ports), dtype=numpy.uint16))
+        for mask, network in self.deny_v4:
+            keep &= (ips & mask) != network
+        if self.allow:
+            inside = numpy.zeros(len(ips), dtype=bool)
+            for mask, network in self.allow_v4:
+                inside |= (ips & mask) == network
+            keep &= inside
+        return keep
+
+
+class PackedProxies:
+    """IPv4 proxies as parallel arrays of packed addresses and ports
+
+    The arrays are NumPy arrays when NumPy is installed and array.array otherwise;
+    entries only become strings as they are iterated. Lines that didn't pack are
+    kept in other as (position, line) pairs, position being the number of packed
+    entries before the line, so iterating yields everything in file order.
+    """
+
+    def __init__(self, ips, ports, other=()):
+        self.ips = ips
+        self.ports = ports
+        self.other = list(other)
+
+    def __len__(self):
+        return len(self.ips)
+
+    def __iter__(self):
+        """Yield "a.b.c.d:port" strings and the other lines, converting a block at a time as they are consumed"""
+        other = iter(self.other)
+        pending = next(other, None)
+        for start in range(0, len(self), 1024):
+            ips = self.ips[start:start + 1024].tolist()
+            ports = self.ports[start:start + 1024].tolist()
+            for position, ip, port in zip(range(start, start + len(ips)), ips, ports):
+                while pending is not None and pending[0] <= position:
+                    yield pending[1]
+                    pending = next(other, None)
+                yield f"{ip >> 24}.{ip >> 16 & 255}.{ip >> 8 & 255}.{ip & 255}:{port}"
+        while pending is not None:
+            yield pending[1]
+            pending = next(other, None)
+
+    def subset(self, keep):
+        """Entries where keep is true, with the other lines' positions moved to match"""
+        if numpy is not None:
+            ips, ports = self.ips[keep], self.ports[keep]
+            before = numpy.concatenate(([0], numpy.cumsum(keep))) if self.other else None
+        else:
+            ips, ports = array("I", compress(self.ips, keep)), array("H", compress(self.ports, keep))
+            before = list(accumulate(keep, initial=0)) if self.other else None
+        return PackedProxies(ips, ports, [(int(before[position]), line) for position, line in self.other])
+
+    def unique(self):
+        """Drop repeats, keeping each entry's first position; returns (PackedProxies, removed)
+
+        Without NumPy the entries are returned as they are and the ProxyIndex drops
+        repeats as they are consumed, instead of paying for a set of every entry.
+        """
+        if numpy is None:
+            return self, 0
+        keys = self.ips.astype(numpy.uint64) << 16 | self.ports
+        ordered = numpy.sort(keys)
+        repeated = numpy.unique(ordered[1:][ordered[1:] == ordered[:-1]])
+        if not len(repeated):
+            return self, 0
+        # Only entries whose key repeats need the slower stable pass that finds first positions
+        slot = numpy.minimum(numpy.searchsorted(repeated, keys), len(repeated) - 1)
+        positions = numpy.flatnonzero(repeated[slot] == keys)
+        _, first = numpy.unique(keys[positions], return_index=True)
+        keep = numpy.ones(len(keys), dtype=bool)
+        keep[positions] = False
+        keep[positions[first]] = True
+        unique = self.subset(keep)
+        return unique, len(self) - len(unique)
+
+    def select(self, proxy_filter):
+        """Keep the entries proxy_filter allows; returns (PackedProxies, removed)"""
+        if numpy is not None:
+            keep = proxy_filter.mask(self.ips, self.ports)
+        else:
+            keep = [proxy_filter.allows_ipv4(ip, port) for ip, port in zip(self.ips, self.ports)]
+        selected = self.subset(keep)
+        return selected, len(self) - len(selected)
+
+
+def parse_bulk_chunk(chunk):
+    """Parse one chunk of a plain list with BULK_LINE_RE
+
+    Returns (ips, ports, other), other holding (position, line) pairs as in PackedProxies.
+    """
+    hosts, ports, other = [], [], []
+    for host, port, line in BULK_LINE_RE.findall(chunk):
+        if line:
+            other.append((len(ports), line.decode("utf-8", "ignore")))
+        elif 0 < int(port) < 65536:
+            hosts.append(host.decode())
+            ports.append(int(port))
+        else:
+            # Out of range ports go the regular way, which counts them as malformed
+            other.append((len(ports), f"{host.decode()}:{port.decode()}"))
+    ips = array("I")
+    ips.frombytes(b"".join(map(socket.inet_aton, hosts)))
+    if sys.byteorder == "little":
+        ips.byteswap()
+    return ips, array("H", ports), other
+
+
+def parse_bulk_chunk_numpy(chunk):
+    """Vectorized parse_bulk_chunk() for when NumPy is installed
+
+    Works on the runs of digits rather than on every byte: a line packs when it is
+    exactly five runs joined by ".", ".", ".", ":" and ends in "\\n" or "\\r\\n".
+    Every other line is handed back as text.
+    """
+    a = numpy.frombuffer(chunk, dtype=numpy.uint8)
+    # Trailing newlines so lookups a few bytes either side of a run stay in bounds
+    padded = numpy.concatenate((a, numpy.full(5, 10, dtype=numpy.uint8)))
+    digit = numpy.concatenate(([False], (a >= 48) & (a <= 57), [False]))
+    starts = numpy.flatnonzero(digit[1:] > digit[:-1])
+    ends = numpy.flatnonzero(digit[:-1] > digit[1:])
+    length = ends - starts
+
+    # Value of every run from its last five digits; longer runs are never valid anyway
+    value = numpy.zeros(len(ends), dtype=numpy.int32)
+    for k in range(1, 6):
+        digits = padded[ends - k].astype(numpy.int32)
+        digits -= 48
+        digits *= 10 ** (k - 1)
+        digits *= length >= k
+        value += digits
+
+    # What each run could be, and how it joins the next one
+    after = padded[ends]
+    octet = (length <= 3) & (value <= 255) & ~((length > 1) & (padded[starts] == 48))
+    port = (length <= 5) & (value >= 1) & (value <= 65535)
+    dot = after == 46
+    colon = after == 58
+    joined = starts[1:] == ends[:-1] + 1
+    opens = padded[starts - 1] == 10
+    closes = (after == 10) | ((after == 13) & (padded[ends + 1] == 10))
+
+    # Run i opens a packable line when runs i..i+4 read a.b.c.d:port
+    m = max(len(starts) - 4, 0)
+    ok = opens[:m] & closes[4:m + 4] & port[4:m + 4] & colon[3:m + 3]
+    for k in range(4):
+        ok &= octet[k:m + k] & joined[k:m + k]
+        if k < 3:
+            ok &= dot[k:m + k]
+    first = numpy.flatnonzero(ok)
+    fields = [value[first + k].astype(numpy.uint32) for k in range(5)]
+    ips = fields[0] << 24 | fields[1] << 16 | fields[2] << 8 | fields[3]
+    ports = fields[4].astype(numpy.uint16)
+
+    # Every line that didn't pack goes through the regular parser, in its place
+    newlines = numpy.flatnonzero(a == 10)
+    line_starts = numpy.concatenate(([0], newlines + 1))
+    packed_lines = numpy.searchsorted(line_starts, starts[first])
+    packed = numpy.zeros(len(line_starts), dtype=bool)
+    packed[packed_lines] = True
+    line_ends = numpy.concatenate((newlines, [len(a)]))
+    unpacked = numpy.flatnonzero(~packed)
+    other = []
+    for i, position in zip(unpacked.tolist(), numpy.searchsorted(packed_lines, unpacked).tolist()):
+        line = chunk[line_starts[i]:line_ends[i]].strip()
+        if line:
+            other.append((position, line.decode("utf-8", "ignore")))
+    return ips, ports, other
+
+
+def load_proxy_file(path):
+    """Parse a plain list file from an mmap into PackedProxies
+
+    Bare IPv4:port lines are packed, while anything else that isn't blank or a
+    comment (schemes, hostnames, IPv6, extra columns, malformed entries) is kept
+    as text for the regular parser, in its place in the file.
+    """
+    parse = parse_bulk_chunk if numpy is None else parse_bulk_chunk_numpy
+    ip_parts, port_parts, other = [], [], []
+    count = 0
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                start = 0
+                while start < size:
+                    end = size
+                    if start + BULK_CHUNK_BYTES < size:
+                        end = mm.rfind(b"\n", start, start + BULK_CHUNK_BYTES) + 1
+                        if end <= start:
+                            # One line longer than a chunk
+                            end = mm.find(b"\n", start + BULK_CHUNK_BYTES) + 1 or size
+                    ips, ports, lines = parse(mm[start:end])
+                    ip_parts.append(ips)
+                    port_parts.append(ports)
+                    other.extend((count + position, line) for position, line in lines)
+                    count += len(ips)
+                    start = end
+    if numpy is not None:
+        ips = numpy.concatenate(ip_parts) if ip_parts else numpy.zeros(0, dtype=numpy.uint32)
+        ports = numpy.concatenate(port_parts) if port_parts else numpy.zeros(0, dtype=numpy.uint16)
+    else:
+        ips, ports = array("I"), array("H")
+        for part in ip_parts:
+            ips.extend(part)
+        for part in port_parts:
+            ports.extend(part)
+    return PackedProxies(ips, ports, other)
+
+
+def parse_plain(lines):
+    """One proxy per line, optionally with a scheme; "#" starts a comment line"""
+    for line in lines:
+        if not line.startswith("#"):
+            yield line
+
+
+def parse_scheme(lines):
+    """Mixed-protocol lists where every entry carries its own scheme://"""
+    for line in lines:
+        if "://" in line:
+            yield line
+
+
+def parse_json(lines):
+    """JSON arrays of "host:port" strings or {ip/host, port, protocol(s)} objects
+
+    A top-level object is searched for the first list under data, proxies, results or items.
+    """
+    data = json.loads("\n".join(lines))
+    if isinstance(data, dict):
+        data = next((data[key] for key in ("data", "proxies", "results", "items") if isinstance(data.get(key), list)), [])
+    for item in data:
+        if isinstance(item, str):
+            yield item
+            continue
+        if not isinstance(item, dict):
+            continue
+        host = item.get("ip") or item.get("host") or item.get("address")
+        port = item.get("port")
+        if not host or not port:
+            continue
+        protocols = item.get("protocols") or item.get("protocol") or item.get("type")
+        if isinstance(protocols, str):
+            protocols = [protocols]
+        if not protocols:
+            yield f"{host}:{port}"
+        for proto in protocols or ():
+            yield f"{str(proto).lower()}://{host}:{port}"
+
+
+# Parser name -> function taking an iterator of stripped lines and yielding list entries.
+# Add to this dict to support another list format.
+SOURCE_PARSERS = {
+    "plain": parse_plain,
+    "scheme": parse_scheme,
+    "json": parse_json,
+}
+
+
+class ProxySource:
+    """One proxy list: a URL or local file path, read with a named parser"""
+
+    def __init__(self, protocol, location, parser="plain", weight=1):
+        if isinstance(parser, str) and parser not in SOURCE_PARSERS:
+            raise ValueError(f"unknown source parser {parser!r}, expected one of {', '.join(SOURCE_PARSERS)}")
+        if weight <= 0:
+            raise ValueError(f"source weight must be positive, got {weight!r}")
+        self.protocol = protocol
+        self.location = location
+        self.parser = parser
+        self.weight = weight  # share of its protocol's checks while streaming
+
+    @classmethod
+    def from_spec(cls, protocol, spec):
+        """Build a source from a URL or path string, or a {"url"/"path", "parser", "weight"} dict"""
+        if isinstance(spec, ProxySource):
+            return spec
+        if isinstance(spec, str):
+            return cls(protocol, spec)
+        return cls(protocol, spec.get("url") or spec["path"], spec.get("parser", "plain"), spec.get("weight", 1))
+
+    @property
+    def is_file(self):
+        return not self.location.lower().startswith(("http://", "https://"))
+
+    @property
+    def name(self):
+        return f"{self.protocol} {self.location}"
+
+    def parse(self, lines):
+        parser = SOURCE_PARSERS[self.parser] if isinstance(self.parser, str) else self.parser
+        return parser(lines)
+
+
+class ProxyResult:
+    """One check result; slotted so large runs don't pay for a dict per proxy"""
+
+    __slots__ = ("proxy", "protocol", "status", "response_time", "reason", "profile")
+
+    def __init__(self, proxy, protocol, status, response_time=None, reason=None):
+        self.proxy = proxy
+        self.protocol = protocol
+        self.status = status
+        self.response_time = response_time
+        self.reason = reason
+        self.profile = None
+
+    def as_dict(self):
+        """Return the result as a plain dict, leaving out empty fields"""
+        result = {
+            name: getattr(self, name) for name in self.__slots__
+            if getattr(self, name) is not None
+        }
+        if self.profile is not None:
+            result["profile"] = self.profile.as_dict()
+        return result
+
+
+# Checked in order against the lowercased failure message; the first match wins
+FAILURE_CODES = (
+    ("prefilter", ("pre-filter",)),
+    ("timeout", ("timed out", "timeout")),
+    ("refused", ("refused", "errno 111")),
+    ("dns", ("name or service", "getaddrinfo", "failed to resolve", "nodename")),
+    ("unreachable", ("unreachable", "no route")),
+    ("tls", ("ssl", "certificate", "tls")),
+    ("closed", ("reset", "aborted", "broken pipe", "disconnected", "closed", "incomplete", "eof")),
+    ("handshake", ("socks", "handshake", "tunnel", "rejected", "malformed", "proxy")),
+)
+
+
+def failure_code(reason):
+    """Reduce a free-form failure message to a short, interned reason code"""
+    if reason.startswith("Status "):
+        return sys.intern("status_" + reason[7:].strip())
+    lowered = reason.lower()
+    for code, needles in FAILURE_CODES:
+        if any(needle in lowered for needle in needles):
+            return code
+    return "other"
+
+
+class FailureSummary:
+    """Failure counts by reason code plus a bounded sample of full failure records"""
+
+    def __init__(self, sample_size=100):
+        self.sample_size = sample_size
+        self.counts = {}
+        self.sample = []
+        self.total = 0
+
+    def __len__(self):
+        return self.total
+
+    def add(self, result):
+        """Count a failed ProxyResult, keeping it only while the sample has room"""
+        code = failure_code(result.reason)
+        self.counts[code] = self.counts.get(code, 0) + 1
+        self.total += 1
+        if len(self.sample) < self.sample_size:
+            self.sample.append(result)
+
+    def merge(self, other):
+        """Fold another summary into this one"""
+        for code, count in other.counts.items():
+            self.counts[code] = self.counts.get(code, 0) + count
+        self.total += other.total
+        self.sample.extend(other.sample[:max(0, self.sample_size - len(self.sample))])
+
+    def top(self, n=3):
+        """Return the n most common (code, count) pairs"""
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:n]
+
+    def clear(self):
+        self.counts.clear()
+        self.sample.clear()
+        self.total = 0
+
+
+def split_proxy(proxy):
+    """Split [userinfo@]host:port into a (host, port) tuple"""
+    host, _, port = proxy.rpartition("@")[2].rpartition(":")
+    return host.strip("[]"), int(port)
+
+
+def proxy_auth(proxy):
+    """Return the (user, password) of a user:pass@host:port proxy, or None"""
+    userinfo, at, _ = proxy.rpartition("@")
+    if not at:
+        return None
+    user, _, password = userinfo.partition(":")
+    return unquote(user), unquote(password)
+
+
+def basic_auth_header(auth):
+    return "Basic " + base64.b64encode(f"{auth[0]}:{auth[1]}".encode("utf-8")).decode("ascii")
+
+
+class ResultWriter:
+    """Append results to a file as they complete, in batches, with atomic size-based rotation
+
+    Records go to "<segment>.part" and the segment is renamed to its final name once it
+    is complete, so a finished file is never half-written and an interrupted run keeps
+    everything flushed so far in the .part file. Subclasses define the encoding.
+    """
+
+    extension = "txt"
+    header = b""
+
+    def __init__(self, path, batch_size=500, rotate_bytes=0):
+        self.path = path
+        self.batch_size = batch_size
+        self.rotate_bytes = rotate_bytes
+        self.pending = []
+        self.segment = 0
+        self.segment_bytes = 0
+        self.count = 0
+        self.file = None
+        self.lock = threading.Lock()
+        self.open_segment()
+
+    @staticmethod
+    def encode(record):
+        return record.proxy
+
+    def segment_path(self):
+        if not self.rotate_bytes:
+            return self.path
+        root, ext = os.path.splitext(self.path)
+        return f"{root}.{self.segment}{ext}"
+
+    def open_segment(self):
+        self.segment += 1
+        self.file = open(self.segment_path() + ".part", "wb")
+        self.file.write(self.header)
+        self.segment_bytes = len(self.header)
+
+    def finish_segment(self):
+        self.file.close()
+        os.replace(self.segment_path() + ".part", self.segment_path())
+
+    def write(self, record):
+        """Queue one ProxyResult, writing the batch out once it is full"""
+        data = self.encode(record)
+        if isinstance(data, str):
+            data = data.encode("utf-8") + b"\n"
+        with self.lock:
+            self.pending.append(data)
+            self.count += 1
+            if len(self.pending) >= self.batch_size:
+                self.flush_pending()
+
+    def flush_pending(self):
+        chunk = b"".join(self.pending)
+        self.pending.clear()
+        self.file.write(chunk)
+        self.file.flush()
+        self.segment_bytes += len(chunk)
+        if self.rotate_bytes and self.segment_bytes >= self.rotate_bytes:
+            self.finish_segment()
+            self.open_segment()
+
+    def flush(self):
+        with self.lock:
+            if self.pending:
+                self.flush_pending()
+
+    def close(self):
+        """Write what is left and give the last segment its final name"""
+        with self.lock:
+            if self.file is None:
+                return
+            if self.pending:
+                self.flush_pending()
+            if self.segment > 1 and self.segment_bytes == len(self.header):
+                # Rotation just opened this segment and nothing followed
+                self.file.close()
+                os.remove(self.segment_path() + ".part")
+            else:
+                self.finish_segment()
+            self.file = None
+
+
+class UriResultWriter(ResultWriter):
+    """Plain text with the scheme kept, for lists that mix protocols"""
+
+    @staticmethod
+    def encode(record):
+        return f"{record.protocol}://{record.proxy}"
+
+
+class JsonlResultWriter(ResultWriter):
+    extension = "jsonl"
+
+    @staticmethod
+    def encode(record):
+        return json.dumps(record.as_dict(), ensure_ascii=False)
+
+
+class CsvResultWriter(ResultWriter):
+    extension = "csv"
+    header = b"protocol,proxy,status,response_time,reason,score\n"
+
+    @staticmethod
+    def encode(record):
+        buffer = io.StringIO()
+        score = record.profile.score if record.profile else None
+        csv.writer(buffer, lineterminator="").writerow(
+            [record.protocol, record.proxy, record.status, record.response_time, record.reason, score]
+        )
+        return buffer.getvalue()
+
+
+RESULT_STATUSES = ("working", "cached", "failed")
+BINARY_MAGIC = b"PXR1"
+# protocol, status, port, response time in ms (NaN if none), host length, reason code length
+BINARY_RECORD = struct.Struct("<BBHfBB")
+
+
+class BinaryResultWriter(ResultWriter):
+    """Compact records: a 10 byte header, then the [userinfo@]host and the failure reason code (no profiles)"""
+
+    extension = "bin"
+    header = BINARY_MAGIC
+
+    @staticmethod
+    def encode(record):
+        host, port = split_proxy(record.proxy)
+        userinfo, at, _ = record.proxy.rpartition("@")
+        host = (userinfo + at + host).encode("ascii", "ignore")[:255]
+        code = failure_code(record.reason).encode("ascii") if record.reason else b""
+        response_time = float("nan") if record.response_time is None else record.response_time
+        return BINARY_RECORD.pack(
+            PROTOCOLS.index(record.protocol), RESULT_STATUSES.index(record.status),
+            port, response_time, len(host), len(code)
+        ) + host + code
+
+
+def read_binary_results(path):
+    """Yield ProxyResult records from a file written by BinaryResultWriter"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(BINARY_MAGIC):
+        raise ValueError(f"{path} is not a binary results file")
+    offset = len(BINARY_MAGIC)
+    while offset + BINARY_RECORD.size <= len(data):
+        proto, status, port, response_time, host_len, code_len = BINARY_RECORD.unpack_from(data, offset)
+        offset += BINARY_RECORD.size
+        host = data[offset:offset + host_len].decode("ascii")
+        offset += host_len
+        code = data[offset:offset + code_len].decode("ascii") or None
+        offset += code_len
+        userinfo, at, host = host.rpartition("@")
+        proxy = userinfo + at + (f"[{host}]:{port}" if ":" in host else f"{host}:{port}")
+        yield ProxyResult(
+            proxy, PROTOCOLS[proto], RESULT_STATUSES[status],
+            None if response_time != response_time else round(response_time, 2), code
+        )
+
+
+RESULT_WRITERS = {
+    "txt": ResultWriter,
+    "uri": UriResultWriter,
+    "json": JsonlResultWriter,
+    "jsonl": JsonlResultWriter,
+    "csv": CsvResultWriter,
+    "bin": BinaryResultWriter,
+}
+
+
+def raise_fd_limit():
+    """Raise the open file limit so thousands of sockets can be in flight"""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or hard > soft:
+        target = 65536 if hard == resource.RLIM_INFINITY else hard
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+        except (ValueError, OSError):
+            pass
+
+
+async def socks4_handshake(reader, writer, host, port, auth=None):
+    """Ask a SOCKS4 proxy to connect to host:port, sending the user as the SOCKS4 user id
+
+    Pass an IPv4 address as host where possible; a name is resolved on every call.
+    """
+    address = host
+    if not IPV4_RE.match(host):
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, family=socket.AF_INET, type=socket.SOCK_STREAM)
+        address = infos[0][4][0]
+    user_id = auth[0].encode("utf-8") if auth else b""
+    writer.write(struct.pack(">BBH", 4, 1, port) + socket.inet_aton(address) + user_id + b"\x00")
+    await writer.drain()
+    reply = await reader.readexactly(8)
+    if reply[1] != 0x5A:
+        raise ProxyHandshakeError(f"SOCKS4 request rejected ({reply[1]:#04x})")
+
+
+async def socks5_negotiate(reader, writer, auth=None):
+    """Agree on no auth, or username/password (RFC 1929) when auth is given, with a SOCKS5 proxy"""
+    writer.write(b"\x05\x02\x00\x02" if auth else b"\x05\x01\x00")
+    await writer.drain()
+    reply = await reader.readexactly(2)
+    if reply[0] != 5 or reply[1] not in ((0, 2) if auth else (0,)):
+        raise ProxyHandshakeError("SOCKS5 authentication method rejected")
+    if reply[1] == 2:
+        user, password = (part.encode("utf-8")[:255] for part in auth)
+        writer.write(b"\x01" + bytes([len(user)]) + user + bytes([len(password)]) + password)
+        await writer.drain()
+        reply = await reader.readexactly(2)
+        if reply[1] != 0:
+            raise ProxyHandshakeError("SOCKS5 username/password rejected")
+
+
+async def socks5_handshake(reader, writer, host, port, auth=None):
+    """Ask a SOCKS5 proxy to connect to host:port"""
+    await socks5_negotiate(reader, writer, auth)
+
+    if IPV4_RE.match(host):
+        writer.write(b"\x05\x01\x00\x01" + socket.inet_aton(host) + struct.pack(">H", port))
+    else:
+        encoded_host = host.encode("idna")
+        writer.write(b"\x05\x01\x00\x03" + bytes([len(encoded_host)]) + encoded_host + struct.pack(">H", port))
+    await writer.drain()
+    reply = await reader.readexactly(4)
+    if reply[1] != 0:
+        raise ProxyHandshakeError(f"SOCKS5 request rejected ({reply[1]:#04x})")
+
+    # Skip the bound address the proxy reports back
+    if reply[3] == 1:
+        await reader.readexactly(4 + 2)
+    elif reply[3] == 4:
+        await reader.readexactly(16 + 2)
+    else:
+        length = (await reader.readexactly(1))[0]
+        await reader.readexactly(length + 2)
+
+
+async def http_connect(reader, writer, host, port, auth=None):
+    """Open a CONNECT tunnel through an HTTP proxy"""
+    request = f"CONNECT {host}:{port} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+    if auth:
+        request += f"Proxy-Authorization: {basic_auth_header(auth)}\r\n"
+    writer.write((request + "\r\n").encode())
+    await writer.drain()
+    status, _ = await read_http_head(reader)
+    if status != 200:
+        raise ProxyHandshakeError(f"CONNECT rejected (status {status})")
+
+
+async def tcp_probe(proto, proxy, target_host, target_port, handshake=True):
+    """Open a TCP connection to a proxy and optionally run a minimal SOCKS handshake"""
+    host, port = split_proxy(proxy)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        if handshake and proto == "socks5":
+            await socks5_negotiate(reader, writer, proxy_auth(proxy))
+        elif handshake and proto == "socks4":
+            await socks4_handshake(reader, writer, target_host, target_port, proxy_auth(proxy))
+    finally:
+        writer.close()
+
+
+async def read_http_head(reader):
+    """Read an HTTP status line and headers, returning (status, headers)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ProxyHandshakeError("Connection closed before response")
+    parts = status_line.split(None, 2)
+    if len(parts) < 2 or not parts[0].startswith(b"HTTP/") or not parts[1].isdigit():
+        raise ProxyHandshakeError("Malformed HTTP response")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return int(parts[1]), headers
+
+
+async def read_http_body(reader, headers, limit=1024 * 1024, sink=None):
+    """Read an HTTP body (content-length, chunked or until close), returning its size
+
+    Data read is passed to sink when one is given. Only the first limit bytes of a
+    content-length or unframed body are read, so the connection can't be reused past that.
+    """
+    if "content-length" in headers:
+        length = int(headers["content-length"])
+        data = await reader.readexactly(min(length, limit))
+        if sink:
+            sink(data)
+        return length
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        total = 0
+        while True:
+            size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                await reader.readline()
+                return total
+            data = await reader.readexactly(size + 2)
+            if sink:
+                sink(data[:-2])
+            total += size
+
+    # Unframed: the body runs until the connection closes
+    total = 0
+    while total < limit:
+        data = await reader.read(limit - total)
+        if not data:
+            break
+        if sink:
+            sink(data)
+        total += len(data)
+    return total
+
+
+class ProxyHealthStore:
+    """SQLite history of proxy checks keyed by (protocol, host:port)"""
+
+    def __init__(self, path, history=20):
+        self.history = history
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS proxy_health (
+                protocol TEXT NOT NULL,
+                address TEXT NOT NULL,
+                last_checked REAL NOT NULL,
+                success_count INTEGER NOT NULL,
+                failure_count INTEGER NOT NULL,
+                consecutive_failures INTEGER NOT NULL,
+                last_failure_reason TEXT,
+                latencies TEXT NOT NULL,
+                PRIMARY KEY (protocol, address)
+            )
+        """)
+        self.conn.commit()
+
+        # Rows are cached in memory and written back in batches
+        self.rows = {}
+        for row in self.conn.execute("SELECT * FROM proxy_health"):
+            self.rows[(row[0], row[1])] = [row[2], row[3], row[4], row[5], row[6], json.loads(row[7])]
+        self.dirty = set()
+
+    def needs_check(self, proto, proxy, now, ttl, dead_backoff, max_backoff):
+        """Return (needs_check, last_latency) for a candidate"""
+        with self.lock:
+            row = self.rows.get((proto, proxy))
+        if row is None:
+            return True, None
+
+        last_checked, _, _, consecutive_failures, _, latencies = row
+        age = now - last_checked
+        if consecutive_failures:
+            backoff = min(max_backoff, dead_backoff * 2 ** (consecutive_failures - 1))
+            return age >= backoff, None
+        return age >= ttl, (latencies[-1] if latencies else None)
+
+    def record(self, proto, proxy, working, response_time=None, reason=None):
+        """Record one check result"""
+        key = (proto, proxy)
+        with self.lock:
+            row = self.rows.get(key) or [0, 0, 0, 0, None, []]
+            row[0] = time.time()
+            if working:
+                row[1] += 1
+                row[3] = 0
+                row[5] = (row[5] + [response_time])[-self.history:]
+            else:
+                row[2] += 1
+                row[3] += 1
+                row[4] = reason
+            self.rows[key] = row
+            self.dirty.add(key)
+            if len(self.dirty) >= 500:
+                self._flush()
+
+    def _flush(self):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO proxy_health VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(*key, *self.rows[key][:5], json.dumps(self.rows[key][5])) for key in self.dirty]
+        )
+        self.conn.commit()
+        self.dirty.clear()
+
+    def flush(self):
+        """Write buffered results to disk"""
+        with self.lock:
+            if self.dirty:
+                self._flush()
+
+    def close(self):
+        """Flush and close the database"""
+        self.flush()
+        self.conn.close()
+
+
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# dns, connect, handshake and first_byte are only measured by the asyncio engine
+PHASES = ("dns", "connect", "handshake", "first_byte", "response", "total")
+
+
+class CheckMetrics:
+    """Check counters and per-protocol, per-phase latency histograms
+
+    Every thread writes to its own shard, so recording never takes a lock;
+    readers merge the shards when they take a snapshot. When a thread exits,
+    its shard is folded into a base shard, so short-lived threads (one per
+    request in serve()) don't pile up.
+    """
+
+    class ShardOwner:
+        """Only referenced from the thread's local storage, so it is collected when the thread exits"""
+
+    def __init__(self):
+        self.local = threading.local()
+        self.base = ({}, {})
+        self.shards = [self.base]
+        self.lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = ({}, {})
+            self.local.shard = shard
+            self.local.owner = self.ShardOwner()
+            weakref.finalize(self.local.owner, self._fold, shard)
+            with self.lock:
+                self.shards.append(shard)
+        return shard
+
+    def _fold(self, shard):
+        with self.lock:
+            # By identity: list.remove() compares shards by value
+            self.shards = [other for other in self.shards if other is not shard]
+            self.add(self.base, shard)
+
+    @staticmethod
+    def add(target, source):
+        counters, histograms = target
+        for key, count in list(source[0].items()):
+            counters[key] = counters.get(key, 0) + count
+        for key, values in list(source[1].items()):
+            histogram = histograms.setdefault(key, [0] * len(values))
+            for i, value in enumerate(values):
+                histogram[i] += value
+
+    def observe(self, proto, outcome, phases):
+        """Count one check and add its phase timings (in seconds) to the histograms"""
+        counters, histograms = self._shard()
+        key = (proto, outcome)
+        counters[key] = counters.get(key, 0) + 1
+        for phase, seconds in phases.items():
+            histogram = histograms.get((proto, phase))
+            if histogram is None:
+                # One count per bucket, one for +Inf, then the running sum in ms
+                histogram = histograms[(proto, phase)] = [0] * (len(LATENCY_BUCKETS_MS) + 1) + [0.0]
+            ms = seconds * 1000
+            histogram[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+            histogram[-1] += ms
+
+    def merge(self, snapshot):
+        """Add a snapshot from another checker (e.g. a worker process)"""
+        self.add(self._shard(), snapshot)
+
+    def snapshot(self):
+        """Merged (counters, histograms) across all shards"""
+        merged = ({}, {})
+        # Hold the lock so a shard being folded into the base isn't counted twice
+        with self.lock:
+            for shard in self.shards:
+                self.add(merged, shard)
+        return merged
+
+    @staticmethod
+    def percentile(histogram, fraction):
+        """Upper bound of the bucket holding the given fraction of samples"""
+        total = sum(histogram[:-1])
+        if not total:
+            return 0.0
+        seen = 0
+        for i, count in enumerate(histogram[:-1]):
+            seen += count
+            if seen >= total * fraction:
+                return float(LATENCY_BUCKETS_MS[i]) if i < len(LATENCY_BUCKETS_MS) else float("inf")
+        return float("inf")
+
+    def to_json(self):
+        counters, histograms = self.snapshot()
+        checks = {}
+        for (proto, outcome), count in sorted(counters.items()):
+            checks.setdefault(proto, {})[outcome] = count
+        latency = {}
+        for (proto, phase), histogram in sorted(histograms.items()):
+            count = sum(histogram[:-1])
+            latency.setdefault(proto, {})[phase] = {
+                "count": count,
+                "mean_ms": round(histogram[-1] / count, 2) if count else 0.0,
+                "p50_ms": self.percentile(histogram, 0.50),
+                "p99_ms": self.percentile(histogram, 0.99),
+            }
+        return {"checks": checks, "latency": latency}
+
+    def to_prometheus(self):
+        counters, histograms = self.snapshot()
+        lines = [
+            "# HELP proxy_checks_total Finished proxy checks by outcome",
+            "# TYPE proxy_checks_total counter",
+        ]
+        for (proto, outcome), count in sorted(counters.items()):
+            lines.append(f'proxy_checks_total{{protocol="{proto}",outcome="{outcome}"}} {count}')
+        lines += [
+            "# HELP proxy_check_phase_seconds Time spent in each phase of a proxy check",
+            "# TYPE proxy_check_phase_seconds histogram",
+        ]
+        for (proto, phase), histogram in sorted(histograms.items()):
+            labels = f'protocol="{proto}",phase="{phase}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS_MS + (None,), histogram[:-1]):
+                cumulative += count
+                le = "+Inf" if bound is None else f"{bound / 1000:g}"
+                lines.append(f'proxy_check_phase_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"proxy_check_phase_seconds_sum{{{labels}}} {histogram[-1] / 1000:.6f}")
+            lines.append(f"proxy_check_phase_seconds_count{{{labels}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+# Local resource exhaustion: back off hard instead of blaming the proxy
+OVERLOAD_ERRNOS = {errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.EADDRNOTAVAIL}
+
+
+class AdaptiveController:
+    """Tunes in-flight concurrency and per-protocol timeouts from observed checks
+
+    Concurrency grows while throughput keeps up, successful checks stay close to
+    the fastest latency seen so far and the share of timeouts and errors stays near
+    its usual level; it shrinks when latency inflates or that share jumps (the uplink
+    is saturated) and halves on local resource exhaustion. Each protocol's timeout
+    is derived from the p95 of its recent successful latencies.
+    """
+
+    def __init__(self, initial, minimum, maximum, max_timeout, min_timeout, interval=1.0, window=200):
+        self.limit = max(minimum, min(initial, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.max_timeout = max_timeout
+        self.min_timeout = min_timeout
+        self.interval = interval
+        self.latencies = {proto: deque(maxlen=window) for proto in PROTOCOLS}
+        self.timeouts = {proto: max_timeout for proto in PROTOCOLS}
+        self.recent = []
+        self.completed = 0
+        self.failures = 0
+        self.overloads = 0
+        self.baseline = None
+        self.failure_baseline = None
+        self.last_rate = 0
+        self.last_adjust = time.monotonic()
+        self.lock = threading.Lock()
+
+    def timeout_for(self, proto):
+        """Current timeout in seconds for a protocol"""
+        return self.timeouts[proto]
+
+    def observe(self, proto, outcome, latency=None):
+        """Record a finished check; outcome is ok, error, timeout or overload"""
+        with self.lock:
+            self.completed += 1
+            if outcome == "ok":
+                self.latencies[proto].append(latency)
+                self.recent.append(latency)
+            elif outcome == "overload":
+                self.overloads += 1
+            else:
+                self.failures += 1
+            now = time.monotonic()
+            if now - self.last_adjust >= self.interval:
+                self._adjust(now)
+
+    def _adjust(self, now):
+        rate = self.completed / (now - self.last_adjust)
+        failing = False
+        if self.completed >= 50:
+            share = self.failures / self.completed
+            # Most lists are largely dead, so compare against the usual share rather than zero
+            if self.failure_baseline is None:
+                self.failure_baseline = share
+            failing = share > self.failure_baseline + max(0.05, (1 - self.failure_baseline) * 0.3)
+            self.failure_baseline = min(self.failure_baseline + 0.01, share)
+
+        if self.overloads:
+            self.limit = max(self.minimum, self.limit // 2)
+        elif failing:
+            self.limit = max(self.minimum, int(self.limit * 0.8))
+        elif len(self.recent) >= 10:
+            current = sorted(self.recent)[len(self.recent) // 2]
+            # Let the baseline creep up slowly so one lucky sample can't pin it
+            self.baseline = current if self.baseline is None else min(self.baseline * 1.05, current)
+            if current > self.baseline * 2:
+                self.limit = max(self.minimum, int(self.limit * 0.8))
+            elif rate >= self.last_rate * 0.9:
+                self.limit = min(self.maximum, self.limit + max(1, self.limit // 5))
+        elif rate >= self.last_rate * 0.9:
+            self.limit = min(self.maximum, self.limit + max(1, self.limit // 5))
+
+        for proto, samples in self.latencies.items():
+            if len(samples) >= 20:
+                p95 = sorted(samples)[int(len(samples) * 0.95)]
+                self.timeouts[proto] = max(self.min_timeout, min(self.max_timeout, p95 * 3))
+
+        self.last_rate = rate
+        self.last_adjust = now
+        self.completed = 0
+        self.failures = 0
+        self.overloads = 0
+        self.recent = []
+
+
+class AsyncLimiter:
+    """asyncio gate that admits as many checks as the controller currently allows"""
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.in_flight = 0
+        self.condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < self.controller.limit)
+            self.in_flight += 1
+
+    async def __aexit__(self, *exc):
+        # Give the slot back before waiting for the lock, so a cancelled check can't leak it
+        self.in_flight -= 1
+        async with self.condition:
+            self.condition.notify(max(1, self.controller.limit - self.in_flight))
+
+
+class ThreadLimiter:
+    """Thread gate that admits as many checks as the controller currently allows"""
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def __enter__(self):
+        with self.condition:
+            self.condition.wait_for(lambda: self.in_flight < self.controller.limit)
+            self.in_flight += 1
+
+    def __exit__(self, *exc):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify(max(1, self.controller.limit - self.in_flight))
+
+
+class FairQueue:
+    """Bounded work queue that interleaves protocols by weight, and each protocol's sources by theirs
+
+    Every source fills its own lane of up to lane_size items. get() serves the protocol
+    with the lowest virtual time, which advances by 1/weight per item, then picks that
+    protocol's lane the same way, so one large or fast list can't starve the others.
+    """
+
+    def __init__(self, lane_size=1000, weights=None):
+        self.lane_size = lane_size
+        self.weights = weights or {}
+        self.lanes = {}  # protocol -> {source: [virtual time, deque of items]}
+        self.passes = {}  # protocol -> virtual time
+        self.pending = {}  # protocol -> queued items
+        self.clock = 0.0
+        self.size = 0
+        self.dropped = set()
+        self.closed = False
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+
+    def put(self, item, source=None):
+        """Queue a (protocol, proxy) pair, blocking while its source's lane is full"""
+        proto = item[0]
+        with self.lock:
+            lanes = self.lanes.setdefault(proto, {})
+            lane = lanes.get(source)
+            if lane is None:
+                lane = lanes[source] = [0.0, deque()]
+            while len(lane[1]) >= self.lane_size and proto not in self.dropped:
+                self.not_full.wait()
+            if proto in self.dropped:
+                return
+            # An idle protocol or lane rejoins at the current time instead of cashing in missed turns
+            if not self.pending.get(proto):
+                self.passes[proto] = max(self.passes.get(proto, 0.0), self.clock)
+            if not lane[1]:
+                lane[0] = max(lane[0], min((other[0] for other in lanes.values() if other[1]), default=lane[0]))
+            lane[1].append(item)
+            self.pending[proto] = self.pending.get(proto, 0) + 1
+            self.size += 1
+            self.not_empty.notify()
+
+    def get(self, timeout=None):
+        """Return the next item in fair order, None once closed and drained; raises Empty on timeout"""
+        with self.lock:
+            if not self.not_empty.wait_for(lambda: self.size or self.closed, timeout):
+                raise Empty
+            if not self.size:
+                return None
+            proto = min((p for p, n in self.pending.items() if n), key=self.passes.__getitem__)
+            lanes = self.lanes[proto]
+            source, lane = min(((s, lane) for s, lane in lanes.items() if lane[1]), key=lambda entry: entry[1][0])
+            item = lane[1].popleft()
+            self.clock = self.passes[proto]
+            self.passes[proto] += 1 / self.weights.get(proto, 1)
+            lane[0] += 1 / getattr(source, "weight", 1)
+            self.pending[proto] -= 1
+            self.size -= 1
+            self.not_full.notify_all()
+            return item
+
+    def drop(self, proto):
+        """Discard a protocol's queued items and refuse new ones; returns how many were dropped"""
+        with self.lock:
+            self.dropped.add(proto)
+            dropped = self.pending.get(proto, 0)
+            for lane in self.lanes.get(proto, {}).values():
+                lane[1].clear()
+            self.pending[proto] = 0
+            self.size -= dropped
+            self.not_full.notify_all()
+            return dropped
+
+    def close(self):
+        """No more puts; get() returns None to every caller once the queue is drained"""
+        with self.lock:
+            self.closed = True
+            self.not_empty.notify_all()
+
+
+ANONYMITY_SCORES = {"elite": 1.0, "anonymous": 0.5, "transparent": 0.0, "unknown": 0.0}
+
+# Request headers that tell the target a proxy is in the way
+PROXY_REVEALING_HEADERS = (
+    "via", "x-forwarded-for", "forwarded", "x-real-ip", "client-ip", "x-client-ip",
+    "proxy-connection", "x-proxy-id", "x-bluecoat-via",
+)
+
+
+class ProxyProfile:
+    """Quality measurements for one working proxy; a probe that was not configured stays None"""
+
+    __slots__ = ("https", "anonymity", "ttfb", "throughput", "score", "error")
+
+    def __init__(self):
+        self.https = None  # CONNECT tunnel plus TLS handshake to profile_https_url worked
+        self.anonymity = None  # elite, anonymous, transparent or unknown
+        self.ttfb = None  # ms from request to response head
+        self.throughput = None  # KB/s over the response body
+        self.score = None
+        self.error = None
+
+    def finish(self, kinds):
+        """Count configured probes that never produced a value as failed, then score"""
+        if "https" in kinds and self.https is None:
+            self.https = False
+        if "echo" in kinds and self.anonymity is None:
+            self.anonymity = "unknown"
+        if "download" in kinds and self.throughput is None:
+            self.throughput = 0.0
+
+        # Weighted 0-100 over the probes that ran; the curves halve at 500ms and 250KB/s
+        parts = []
+        if self.ttfb is not None:
+            parts.append((30, 1 / (1 + self.ttfb / 500)))
+        if self.throughput is not None:
+            parts.append((30, self.throughput / (self.throughput + 250)))
+        if self.https is not None:
+            parts.append((20, 1.0 if self.https else 0.0))
+        if self.anonymity is not None:
+            parts.append((20, ANONYMITY_SCORES[self.anonymity]))
+        if parts:
+            self.score = round(100 * sum(w * v for w, v in parts) / sum(w for w, _ in parts), 1)
+
+    def as_dict(self):
+        return {
+            name: getattr(self, name) for name in self.__slots__
+            if getattr(self, name) is not None
+        }
+
+
+def classify_anonymity(body, real_ip):
+    """Grade a proxy from the request headers an echo service saw
+
+    Accepts httpbin-style JSON ({"headers": {...}}) or plain "Name: value" lines.
+    """
+    text = body.decode("utf-8", "ignore")
+    headers = None
+    try:
+        echoed = json.loads(text)
+        if isinstance(echoed, dict) and isinstance(echoed.get("headers"), dict):
+            headers = {name.lower(): str(value) for name, value in echoed["headers"].items()}
+    except ValueError:
+        pass
+    if headers is None:
+        headers = {}
+        for line in text.splitlines():
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+
+    revealing = [value for name, value in headers.items() if name in PROXY_REVEALING_HEADERS]
+    if real_ip and any(real_ip in re.split(r'[\s,;="]+', value) for value in revealing):
+        return "transparent"
+    if revealing:
+        return "anonymous"
+    return "elite"
+
+
+class ProfileStage:
+    """Second stage that profiles working proxies on a background event loop
+
+    ProxyChecker.add_working() hands records here instead of publishing them;
+    each record is published once its profile is finished.
+    """
+
+    def __init__(self, checker):
+        self.checker = checker
+        self.config = checker.config
+        self.kinds = {
+            kind for kind, key in (("echo", "profile_echo_url"), ("https", "profile_https_url"),
+                                   ("download", "profile_download_url"))
+            if self.config[key]
+        }
+        self.real_ip = self.config["profile_real_ip"]
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.semaphore = None
+        self.futures = []
+        self.lock = threading.Lock()
+
+    def start(self):
+        if not self.real_ip and "echo" in self.kinds:
+            # Ask the echo service directly which address it sees for us
+            try:
+                url = self.config["profile_echo_url"]
+                response = self.checker.get_source_session().get(url, timeout=10, **self.checker.direct_request_options(url))
+                self.real_ip = str(response.json().get("origin", "")).split(",")[0].strip()
+            except (requests.RequestException, ValueError, AttributeError):
+                self.real_ip = ""
+        self.thread.start()
+
+    def submit(self, record):
+        future = asyncio.run_coroutine_threadsafe(self.run(record), self.loop)
+        with self.lock:
+            self.futures.append(future)
+
+    async def run(self, record):
+        profile = ProxyProfile()
+        timeout = self.config["profile_timeout"]
+        if self.semaphore is None:
+            # Created on the stage's own loop, which is the only place it is used
+            self.semaphore = asyncio.Semaphore(self.config["profile_concurrency"])
+        async with self.semaphore:
+            try:
+                await asyncio.wait_for(self.checker.profile_proxy(record.protocol, record.proxy, profile, self.real_ip), timeout)
+            except asyncio.TimeoutError:
+                profile.error = f"Timed out after {timeout:g}s"
+            except Exception as e:
+                profile.error = str(e) or type(e).__name__
+        profile.finish(self.kinds)
+        record.profile = profile
+        self.checker.publish(record)
+
+    def close(self):
+        """Wait for every submitted profile, then stop the loop"""
+        with self.lock:
+            futures = list(self.futures)
+        for future in futures:
+            future.result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+class PoolEntry:
+    """One live pool member with smoothed latency and check history"""
+
+    __slots__ = ("protocol", "proxy", "latency", "checks", "successes", "failures", "checked")
+
+    def __init__(self, protocol, proxy, latency, checked):
+        self.protocol = protocol
+        self.proxy = proxy
+        self.latency = latency
+        self.checks = 0
+        self.successes = 0
+        self.failures = 0  # consecutive
+        self.checked = checked
+
+    def success_rate(self):
+        # Smoothed so a single check can't rank a proxy as perfect or worthless
+        return (self.successes + 1) / (self.checks + 2)
+
+    def score(self):
+        """Lower is better: latency inflated by unreliability"""
+        return self.latency / self.success_rate()
+
+    def as_dict(self):
+        return {
+            "proxy": self.proxy,
+            "protocol": self.protocol,
+            "latency": round(self.latency, 2),
+            "success_rate": round(self.success_rate(), 3),
+            "checked": round(self.checked, 3),
+        }
+
+
+class ProxyPool:
+    """Latency-ranked set of working proxies, fed by check results and queried by the API"""
+
+    def __init__(self, max_failures=3, smoothing=0.3):
+        self.max_failures = max_failures
+        self.smoothing = smoothing
+        self.entries = {}
+        self.refreshed = None
+        self.lock = threading.Lock()
+
+    def update(self, record):
+        """Fold a ProxyResult into the pool; members are dropped after max_failures in a row"""
+        key = (record.protocol, record.proxy)
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if record.status == "failed":
+                if entry is not None:
+                    entry.checks += 1
+                    entry.failures += 1
+                    entry.checked = now
+                    if entry.failures >= self.max_failures:
+                        del self.entries[key]
+                return
+            if entry is None:
+                entry = self.entries[key] = PoolEntry(record.protocol, record.proxy, record.response_time, now)
+            elif record.status == "cached":
+                return
+            else:
+                entry.latency += self.smoothing * (record.response_time - entry.latency)
+            entry.checks += 1
+            entry.successes += 1
+            entry.failures = 0
+            entry.checked = now
+
+    def best(self, protocol=None, n=10):
+        """Return the n best-ranked members, optionally of one protocol"""
+        with self.lock:
+            members = [e for e in self.entries.values() if protocol is None or e.protocol == protocol]
+            return [entry.as_dict() for entry in heapq.nsmallest(n, members, key=PoolEntry.score)]
+
+    def due(self, now, interval, limit):
+        """Members to re-probe, oldest check first, with reliable ones pulled forward by up to one interval"""
+        with self.lock:
+            members = [e for e in self.entries.values() if now - e.checked >= interval]
+            members = heapq.nsmallest(limit, members, key=lambda e: e.checked - e.success_rate() * interval)
+            return [(entry.protocol, entry.proxy) for entry in members]
+
+    def summary(self):
+        with self.lock:
+            counts = {proto: 0 for proto in PROTOCOLS}
+            for protocol, _ in self.entries:
+                counts[protocol] += 1
+            return {"size": len(self.entries), "protocols": counts, "refreshed": self.refreshed}
+
+
+class PoolRequestHandler(BaseHTTPRequestHandler):
+    """Local pool API: GET /proxies?protocol=socks5&n=10[&format=txt], /stats and /health"""
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/health":
+            self.reply(200, "ok\n", "text/plain")
+        elif url.path == "/stats":
+            self.reply(200, json.dumps(self.server.pool.summary()), "application/json")
+        elif url.path == "/proxies":
+            protocol = query.get("protocol", [None])[0]
+            try:
+                n = int(query.get("n", ["10"])[0])
+            except ValueError:
+                n = -1
+            if (protocol and protocol not in PROTOCOLS) or n < 0:
+                self.reply(400, "protocol must be one of http, socks4, socks5 and n a count\n", "text/plain")
+                return
+            best = self.server.pool.best(protocol, n)
+            if query.get("format", ["json"])[0] == "txt":
+                self.reply(200, "".join(f"{p['protocol']}://{p['proxy']}\n" for p in best), "text/plain")
+            else:
+                self.reply(200, json.dumps(best), "application/json")
+        else:
+            self.reply(404, "not found\n", "text/plain")
+
+    def reply(self, status, body, content_type):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ProxyChecker:
+    def __init__(self, config=None, interactive=True):
+        self.interactive = interactive
+        self.on_result = None
+        self.urls = {
+            "http": "https://raw.githubusercontent.com/monosans/proxy-list/main/proxies/http.txt",
+            "socks4": "https://raw.githubusercontent.com/monosans/proxy-list/main/proxies/socks4.txt",
+            "socks5": "https://raw.githubusercontent.com/monosans/proxy-list/main/proxies/socks5.txt",
+        }
+        
+        self.headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                          "AppleWebKit/537.36 (KHTML, like Gecko) "
+                          "Chrome/119.0.0.0 Safari/537.36"
+        }
+        
+        self.config = {
+            "test_url": "http://example.com",
+            "max_proxies": 300,
+            "thread_count": 80,
+            "timeout": 8,
+            "save_logs": True,
+            "export_format": "txt",  # txt (host:port), uri (proto://host:port), json, csv, bin
+            "stream_export": False,  # append each result to a file as it completes
+            "results_file": "",  # file for streamed results, empty for results_<timestamp>.<format>
+            "export_failed": False,  # also write failed results
+            "export_batch": 500,  # results buffered before each write
+            "export_rotate_mb": 0,  # start a new numbered file past this size, 0 to disable
+            "engine": "threads",  # threads, asyncio, processes
+            "concurrency": 1000,  # in-flight checks for the asyncio engine
+            "streaming": True,  # check proxies while the lists are still downloading
+            "queue_size": 1000,  # bounded work queue between fetchers and checkers, per source
+            "quotas": {},  # stop a protocol once it has this many working proxies, e.g. {"socks5": 200}
+            "protocol_weights": {},  # share of streamed checks per protocol, e.g. {"socks5": 2}; default 1
+            "health_store": False,  # skip proxies checked recently (see recheck_ttl)
+            "health_db": "proxy_health.db",
+            "recheck_ttl": 3600,  # seconds before a working proxy is re-checked
+            "dead_backoff": 600,  # first backoff for failing proxies, doubled per failure
+            "max_backoff": 86400,
+            "dedup_across_protocols": False,  # also collapse one host:port listed under several protocols
+            "prefilter": False,  # drop proxies that refuse a plain TCP connect before the full check
+            "prefilter_timeout": 2,  # deadline in seconds for a whole pre-filter batch
+            "prefilter_handshake": True,  # also require a minimal SOCKS handshake
+            "prefilter_batch": 1000,
+            "source_cache_dir": ".proxy_cache",  # cached lists for conditional GETs, empty to disable
+            "source_max_age": 0,  # seconds a cached list is reused without asking the server
+            "source_timeout": 15,
+            "bulk_min_bytes": 1024 * 1024,  # plain list files and cached lists this big are parsed in bulk via mmap, 0 to disable
+            "allow_networks": [],  # only check proxies inside these CIDRs, e.g. ["203.0.113.0/24"]
+            "deny_networks": [],  # never check proxies inside these CIDRs
+            "allow_ports": [],  # only check proxies on these ports
+            "process_count": 0,  # worker processes for the processes engine, 0 for one per CPU
+            "shard_size": 500,  # proxies sent to a worker process at a time
+            "adaptive": False,  # tune concurrency and per-protocol timeouts while running
+            "adaptive_min_concurrency": 10,
+            "adaptive_max_concurrency": 5000,  # upper bound for the asyncio engine
+            "min_timeout": 1.5,  # lowest per-protocol timeout; "timeout" is the highest
+            "print_results": True,  # one console line per working proxy
+            "progress_interval": 1.0,  # seconds between progress redraws when print_results is off, 0 to disable
+            "metrics_file": "",  # write run metrics here while running and at the end
+            "metrics_format": "prometheus",  # prometheus, json
+            "failed_sample": 100,  # full failure records kept for export; the rest are only counted
+            "refresh_interval": 900,  # service mode: seconds between full source refreshes
+            "pool_recheck_interval": 120,  # service mode: seconds before a pool member is re-probed
+            "pool_recheck_batch": 200,  # service mode: members re-probed per round
+            "pool_max_failures": 3,  # service mode: consecutive failures before a member is dropped
+            "api_host": "127.0.0.1",
+            "api_port": 8899,
+            "tls_ca_file": "",  # extra CA bundle for HTTPS test and profiling targets
+            "profile": False,  # measure HTTPS, anonymity, TTFB and throughput of working proxies
+            "profile_echo_url": "http://httpbin.org/get",  # must echo the request headers back, empty to skip
+            "profile_https_url": "https://www.example.com/",  # empty to skip the HTTPS probe
+            "profile_download_url": "",  # a large file for the throughput probe, empty to skip
+            "profile_download_bytes": 1024 * 1024,
+            "profile_real_ip": "",  # our public IP for the transparency check, asked from the echo URL if empty
+            "profile_timeout": 20,  # seconds for all probes of one proxy
+            "profile_concurrency": 50
+        }
+        if config:
+            self.config.update(config)
+        
+        self.stats = {
+            "total": 0,
+            "tested": 0,
+            "working": 0,
+            "failed": 0,
+            "start_time": None,
+            "end_time": None
+        }
+        
+        self.working_proxies = []
+        self.failed_proxies = FailureSummary(self.config["failed_sample"])
+        self.result_writer = None
+        self.profile_stage = None
+        self.source_counts = {}
+        self.quotas = {}
+        self.done_protocols = set()
+        self.cancel_requested = False
+        self.cancelled_protocols = set()
+        self.inflight = {}
+        self.work_queue = None
+        self.proxy_filter = None
+        self.pool = None
+        self.api_address = None
+        self.health_store = None
+        self.index = ProxyIndex()
+        self.cache_locks = {}
+        self.source_session = None
+        self.source_pool_size = 0
+        self.target_addresses = {}
+        self.controller = None
+        self.metrics = CheckMetrics()
+        self.thread_limiter = contextlib.nullcontext()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        
+    def print_banner(self):
+        """Print colored banner"""
+        banner = f"""
+{Fore.CYAN}╔══════════════════════════════════════════════════════════════╗
+{Fore.CYAN}║                                                              ║
+{Fore.CYAN}║  {Fore.YELLOW}██████╗ ██████╗  ██████╗ ██╗  ██╗██╗   ██╗                   {Fore.CYAN}║
+{Fore.CYAN}║  {Fore.YELLOW}██╔══██╗██╔══██╗██╔═══██╗╚██╗██╔╝╚██╗ ██╔╝                   {Fore.CYAN}║
+{Fore.CYAN}║  {Fore.YELLOW}██████╔╝██████╔╝██║   ██║ ╚███╔╝  ╚████╔╝                    {Fore.CYAN}║
+{Fore.CYAN}║  {Fore.YELLOW}██╔═══╝ ██╔══██╗██║   ██║ ██╔██╗   ╚██╔╝                     {Fore.CYAN}║
+{Fore.CYAN}║  {Fore.YELLOW}██║     ██║  ██║╚██████╔╝██╔╝ ██╗   ██║                      {Fore.CYAN}║
+{Fore.CYAN}║  {Fore.YELLOW}╚═╝     ╚═╝  ╚═╝ ╚═════╝ ╚═╝  ╚═╝   ╚═╝                      {Fore.CYAN}║
+{Fore.CYAN}║                                                              ║
+{Fore.CYAN}║           {Fore.GREEN}Enhanced Proxy Checker - Version 2.0{Fore.CYAN}              ║
+{Fore.CYAN}║            {Fore.MAGENTA}High Speed • Premium Quality • Beautiful UI{Fore.CYAN}       ║
+{Fore.CYAN}╚══════════════════════════════════════════════════════════════╝
+        """
+        print(banner)
+        
+    def print_menu(self):
+        """Print main menu"""
+        menu = f"""
+{Fore.CYAN}┌─────────────────────────────────────────────────┐
+{Fore.CYAN}│                   {Fore.YELLOW}Main Menu{Fore.CYAN}                    │
+{Fore.CYAN}├─────────────────────────────────────────────────┤
+{Fore.CYAN}│  {Fore.GREEN}1.{Fore.WHITE} Check All Proxy Types                      {Fore.CYAN}│
+{Fore.CYAN}│  {Fore.GREEN}2.{Fore.WHITE} Check Specific Proxy Type                  {Fore.CYAN}│
+{Fore.CYAN}│  {Fore.GREEN}3.{Fore.WHITE} View Current Settings                      {Fore.CYAN}│
+{Fore.CYAN}│  {Fore.GREEN}4.{Fore.WHITE} Modify Settings                           {Fore.CYAN}│
+{Fore.CYAN}│  {Fore.GREEN}5.{Fore.WHITE} View Statistics                           {Fore.CYAN}│
+{Fore.CYAN}│  {Fore.GREEN}6.{Fore.WHITE} Export Results                            {Fore.CYAN}│
+{Fore.CYAN}│  {Fore.GREEN}7.{Fore.WHITE} Clear Memory                              {Fore.CYAN}│
+{Fore.CYAN}│  {Fore.RED}0.{Fore.WHITE} Exit                                       {Fore.CYAN}│
+{Fore.CYAN}└─────────────────────────────────────────────────┘
+        """
+        print(menu)
+
+    def clear_screen(self):
+        """Clear screen (ANSI escape, translated by colorama on Windows)"""
+        print("\033[2J\033[H", end="", flush=True)
+
+    def make_session(self, pool_size):
+        session = requests.Session()
+        session.headers.update(self.headers)
+        # Skip per-request environment and .netrc lookups for proxy checks;
+        # direct requests take theirs from direct_request_options()
+        session.trust_env = False
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def get_session(self):
+        """Return this thread's pooled Session for proxy checks"""
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = self.make_session(4)
+        return session
+
+    def get_source_session(self, sources=0):
+        """Return the Session shared by all list downloads, keeping connections alive across sources and runs
+
+        It is replaced by a bigger one when a run has more sources than its pool holds connections.
+        """
+        with self.lock:
+            if self.source_session is None or self.source_pool_size < sources:
+                self.source_pool_size = max(10, sources)
+                self.source_session = self.make_session(self.source_pool_size)
+            return self.source_session
+
+    @staticmethod
+    def direct_request_options(url):
+        """Environment proxies (honouring NO_PROXY) and CA bundle for a request that isn't a proxy check"""
+        verify = os.environ.get("REQUESTS_CA_BUNDLE") or os.environ.get("CURL_CA_BUNDLE") or True
+        return {"proxies": requests.utils.get_environ_proxies(url), "verify": verify}
+
+    def check_proxy(self, proto, proxy, working_list, failed_list):
+        """Check a single proxy"""
+        proxy_url = f"{proto}://{proxy}"
+        proxies = {
+            "http": proxy_url,
+            "https": proxy_url,
+        }
+        session = self.get_session()
+        outcome = "error"
+        phases = {}
+        
+        try:
+            with self.thread_limiter:
+                start_time = time.time()
+                response = session.get(
+                    self.config["test_url"], 
+                    proxies=proxies, 
+                    timeout=self.check_timeout(proto)
+                )
+                end_time = time.time()
+            response_time = round((end_time - start_time) * 1000, 2)
+            # requests only exposes the time until the headers were parsed
+            phases["first_byte"] = response.elapsed.total_seconds()
+            phases["response"] = max(0.0, end_time - start_time - phases["first_byte"])
+
+            if response.status_code == 200:
+                outcome = "ok"
+                self.add_working(working_list, proto, proxy, response_time)
+            else:
+                self.add_failed(failed_list, proto, proxy, f"Status {response.status_code}")
+
+        except requests.Timeout as e:
+            outcome = "timeout"
+            self.add_failed(failed_list, proto, proxy, str(e))
+        except Exception as e:
+            self.add_failed(failed_list, proto, proxy, str(e))
+
+        finally:
+            phases["total"] = time.time() - start_time
+            self.metrics.observe(proto, outcome, phases)
+            if self.controller:
+                self.controller.observe(proto, outcome, phases["total"])
+            # Each proxy is used once, so don't let its connection pool pile up in the adapter
+            adapter = session.get_adapter(self.config["test_url"])
+            manager = adapter.proxy_manager.pop(proxy_url, None)
+            if manager is not None:
+                manager.clear()
+
+    def add_working(self, working_list, proto, proxy, response_time):
+        """Record a working proxy"""
+        record = ProxyResult(proxy, proto, "working", response_time)
+        with self.lock:
+            if proto in self.done_protocols:
+                # Finished after its protocol's quota was met
+                self.stats["cancelled"] += 1
+                return
+            working_list.append(record)
+            self.stats["working"] += 1
+            self.stats["tested"] += 1
+            quota_met = self.count_toward_quota(proto, working_list)
+        if self.profile_stage:
+            self.profile_stage.submit(record)
+        else:
+            self.publish(record)
+        if self.config["print_results"]:
+            # One write outside the lock so workers never queue behind the terminal
+            sys.stdout.write(f"{Fore.GREEN}✅ {proto.upper():<7} {Fore.YELLOW}{proxy:<21} {Fore.GREEN}({response_time}ms){Style.RESET_ALL}\n")
+        if self.health_store:
+            self.health_store.record(proto, proxy, True, response_time=response_time)
+        if quota_met:
+            self.finish_protocol(proto)
+
+    def add_failed(self, failed_list, proto, proxy, reason):
+        """Record a failed proxy in its protocol's FailureSummary"""
+        record = ProxyResult(proxy, proto, "failed", reason=reason)
+        with self.lock:
+            if proto in self.done_protocols:
+                self.stats["cancelled"] += 1
+                return
+            failed_list.add(record)
+            self.stats["failed"] += 1
+            self.stats["tested"] += 1
+        self.publish(record)
+        if self.health_store:
+            self.health_store.record(proto, proxy, False, reason=reason)
+
+    def publish(self, record):
+        """Hand a finished result to the streaming writer and the on_result callback"""
+        if self.result_writer and (record.status != "failed" or self.config["export_failed"]):
+            self.result_writer.write(record)
+        if self.on_result:
+            self.on_result(record)
+
+    def count_toward_quota(self, proto, working_list):
+        """With self.lock held after a working record was added: True if it met its protocol's quota"""
+        quota = self.quotas.get(proto)
+        if quota and len(working_list) >= quota:
+            self.done_protocols.add(proto)
+            return True
+        return False
+
+    def finish_protocol(self, proto):
+        """Stop a protocol whose quota is met"""
+        print(f"{Fore.GREEN}🎯 {proto.upper()} quota of {self.quotas[proto]} met, stopping its checks")
+        self.stop_protocol(proto)
+
+    def cancel(self):
+        """Stop the current run early, from any thread
+
+        Queued candidates are dropped and sources stop being read; checks already
+        running finish (asyncio checks of protocols with a quota are cancelled) and
+        their results are discarded.
+        """
+        with self.lock:
+            self.cancel_requested = True
+            stopping = [proto for proto in self.source_counts if proto not in self.done_protocols]
+            self.cancelled_protocols.update(stopping)
+            self.done_protocols.update(stopping)
+        for proto in stopping:
+            self.stop_protocol(proto)
+
+    def stop_protocol(self, proto):
+        """With proto in done_protocols: drop its queued candidates and cancel its tracked in-flight checks"""
+        dropped = self.work_queue.drop(proto) if self.work_queue else 0
+        try:
+            current = asyncio.current_task()
+        except RuntimeError:
+            current = None
+        with self.lock:
+            self.stats["cancelled"] += dropped
+            tasks = list(self.inflight.get(proto, ()))
+        for task in tasks:
+            # The check that met the quota is still recording its own result
+            if task is not current:
+                task.get_loop().call_soon_threadsafe(task.cancel)
+
+    def quotas_met(self, protocols=None):
+        """True once every protocol in the run (or in protocols) is done, by its quota or by cancel()"""
+        stoppable = bool(self.quotas) or self.cancel_requested
+        return stoppable and self.done_protocols >= set(protocols or self.source_counts)
+
+    def select_for_check(self, proto, proxy, working_list):
+        """Decide whether a candidate needs a network check, reusing fresh history"""
+        if not self.health_store:
+            return True
+
+        needs_check, last_latency = self.health_store.needs_check(
+            proto, proxy, time.time(),
+            self.config["recheck_ttl"], self.config["dead_backoff"], self.config["max_backoff"]
+        )
+        if needs_check:
+            return True
+
+        with self.lock:
+            self.stats["skipped"] += 1
+            if last_latency is None or proto in self.done_protocols:
+                return False
+            record = ProxyResult(proxy, proto, "cached", last_latency)
+            working_list.append(record)
+            self.stats["working"] += 1
+            quota_met = self.count_toward_quota(proto, working_list)
+        self.publish(record)
+        if quota_met:
+            self.finish_protocol(proto)
+        return False
+
+    async def async_probe(self, proto, proxy, phases):
+        """Fetch the test URL through a proxy on the event loop, returning the final HTTP status
+
+        Redirects are followed as requests follows them in the threads engine. Phase
+        timings in seconds are written into phases as the check progresses; after a
+        redirect they describe the last request.
+        """
+        url = self.config["test_url"]
+        for _ in range(MAX_REDIRECTS + 1):
+            reader, writer, absolute = await self.open_route(proto, proxy, url, phases)
+            try:
+                mark = time.perf_counter()
+                writer.write(self.build_request(url, absolute, auth=proxy_auth(proxy)))
+                await writer.drain()
+
+                status, headers = await read_http_head(reader)
+                phases["first_byte"], mark = time.perf_counter() - mark, time.perf_counter()
+                await read_http_body(reader, headers)
+                phases["response"] = time.perf_counter() - mark
+            finally:
+                writer.close()
+            if status not in REDIRECT_STATUSES or "location" not in headers:
+                return status
+            url = urljoin(url, headers["location"])
+        raise ProxyHandshakeError(f"Exceeded {MAX_REDIRECTS} redirects")
+
+    async def open_route(self, proto, proxy, url, phases):
+        """Connect through a proxy towards url's host, returning (reader, writer, absolute)
+
+        absolute is True when requests must use the absolute form (plain HTTP via an
+        HTTP proxy, which can then carry requests for any http:// host); otherwise the
+        connection is a tunnel, with TLS on top for https:// URLs.
+        """
+        scheme, host, port, _ = parse_target(url)
+        proxy_host, proxy_port = split_proxy(proxy)
+        mark = time.perf_counter()
+        if not IPV4_RE.match(proxy_host):
+            infos = await asyncio.get_running_loop().getaddrinfo(proxy_host, proxy_port, type=socket.SOCK_STREAM)
+            proxy_host = infos[0][4][0]
+            phases["dns"], mark = time.perf_counter() - mark, time.perf_counter()
+        reader, writer = await asyncio.open_connection(proxy_host, proxy_port)
+        phases["connect"], mark = time.perf_counter() - mark, time.perf_counter()
+
+        if proto == "http" and scheme == "http":
+            return reader, writer, True
+        auth = proxy_auth(proxy)
+        try:
+            if proto == "socks4":
+                await socks4_handshake(reader, writer, self.target_addresses.get(host, host), port, auth)
+            elif proto == "socks5":
+                await socks5_handshake(reader, writer, self.target_addresses.get(host, host), port, auth)
+            else:
+                await http_connect(reader, writer, host, port, auth)
+            if scheme == "https":
+                context = ssl.create_default_context(cafile=self.config["tls_ca_file"] or None)
+                await writer.start_tls(context, server_hostname=host)
+        except BaseException:
+            writer.close()
+            raise
+        phases["handshake"] = time.perf_counter() - mark
+        return reader, writer, False
+
+    def build_request(self, url, absolute, keep_alive=False, auth=None):
+        """Encode a GET for url in absolute or origin form, with proxy credentials on the absolute form"""
+        _, host, port, path = parse_target(url)
+        host_header = host if port in (80, 443) else f"{host}:{port}"
+        target = f"http://{host_header}{path}" if absolute else path
+        request = f"GET {target} HTTP/1.1\r\nHost: {host_header}\r\n"
+        if absolute and auth:
+            request += f"Proxy-Authorization: {basic_auth_header(auth)}\r\n"
+        for name, value in self.headers.items():
+            request += f"{name}: {value}\r\n"
+        request += f"Accept: */*\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        return request.encode()
+
+    def profile_routes(self, proto):
+        """Group the configured profiling probes by the connection that can carry them"""
+        routes = {}
+        for kind, key in (("echo", "profile_echo_url"), ("https", "profile_https_url"),
+                          ("download", "profile_download_url")):
+            url = self.config[key]
+            if not url:
+                continue
+            scheme, host, port, _ = parse_target(url)
+            route = "absolute" if proto == "http" and scheme == "http" else (scheme, host, port)
+            routes.setdefault(route, []).append((kind, url))
+        return routes
+
+    async def profile_proxy(self, proto, proxy, profile, real_ip=""):
+        """Run the profiling probes for one proxy, filling in profile
+
+        Probes that can share a connection (same tunnel target, or any plain-HTTP URL
+        through an HTTP proxy) are sent one after another on a single keep-alive
+        connection, echo first and the download last.
+        """
+        for probes in self.profile_routes(proto).values():
+            writer = None
+            try:
+                for kind, url in probes:
+                    if writer is None:
+                        reader, writer, absolute = await self.open_route(proto, proxy, url, {})
+                    sent = time.perf_counter()
+                    writer.write(self.build_request(url, absolute, keep_alive=True, auth=proxy_auth(proxy)))
+                    await writer.drain()
+                    status, headers = await read_http_head(reader)
+                    first_byte = time.perf_counter()
+                    ttfb = round((first_byte - sent) * 1000, 2)
+
+                    chunks = []
+                    limit = self.config["profile_download_bytes"] if kind == "download" else 64 * 1024
+                    size = await read_http_body(reader, headers, limit, chunks.append if kind == "echo" else None)
+                    elapsed = time.perf_counter() - first_byte
+
+                    if kind == "echo":
+                        profile.ttfb = ttfb
+                        profile.anonymity = classify_anonymity(b"".join(chunks), real_ip) if status == 200 else "unknown"
+                    elif kind == "https":
+                        # Any response over the tunnel means CONNECT and the TLS handshake both worked
+                        profile.https = True
+                    elif status == 200:
+                        profile.ttfb = ttfb
+                        profile.throughput = round(min(size, limit) / 1024 / max(elapsed, 1e-6), 1)
+
+                    framed = "content-length" in headers or "chunked" in headers.get("transfer-encoding", "").lower()
+                    if not framed or size > limit or headers.get("connection", "").lower() == "close":
+                        writer.close()
+                        writer = None
+            except (OSError, asyncio.IncompleteReadError, ProxyHandshakeError, ssl.SSLError, ValueError) as e:
+                profile.error = str(e) or type(e).__name__
+            finally:
+                if writer is not None:
+                    writer.close()
+
+    async def async_check_proxy(self, proto, proxy, working_list, failed_list, limiter):
+        """Check a single proxy on the event loop"""
+        async with limiter:
+            outcome = "error"
+            phases = {}
+            timeout = self.check_timeout(proto)
+            start_time = time.time()
+            try:
+                status = await asyncio.wait_for(self.async_probe(proto, proxy, phases), timeout)
+                end_time = time.time()
+                response_time = round((end_time - start_time) * 1000, 2)
+
+                if status == 200:
+                    outcome = "ok"
+                    self.add_working(working_list, proto, proxy, response_time)
+                else:
+                    self.add_failed(failed_list, proto, proxy, f"Status {status}")
+
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                self.add_failed(failed_list, proto, proxy, f"Timed out after {timeout:g}s")
+            except Exception as e:
+                if isinstance(e, OSError) and e.errno in OVERLOAD_ERRNOS:
+                    outcome = "overload"
+                self.add_failed(failed_list, proto, proxy, str(e) or type(e).__name__)
+
+            phases["total"] = time.time() - start_time
+            self.metrics.observe(proto, outcome, phases)
+            if self.controller:
+                self.controller.observe(proto, outcome, phases["total"])
+
+    async def scheduled_check(self, proto, proxy, working_lists, failed_lists, limiter):
+        """Run async_check_proxy, as a task that finish_protocol() can cancel when the protocol has a quota"""
+        if proto in self.done_protocols:
+            return
+        if proto not in self.quotas:
+            await self.async_check_proxy(proto, proxy, working_lists[proto], failed_lists[proto], limiter)
+            return
+        task = asyncio.ensure_future(self.async_check_proxy(proto, proxy, working_lists[proto], failed_lists[proto], limiter))
+        with self.lock:
+            self.inflight.setdefault(proto, set()).add(task)
+        try:
+            await asyncio.wait([task])
+        finally:
+            with self.lock:
+                self.inflight[proto].discard(task)
+        if task.cancelled():
+            with self.lock:
+                self.stats["cancelled"] += 1
+
+    def check_timeout(self, proto):
+        """Timeout for the next check of a protocol"""
+        return self.controller.timeout_for(proto) if self.controller else self.config["timeout"]
+
+    def make_controller(self, initial, maximum):
+        """Create the adaptive controller on first use when adaptive mode is on"""
+        if self.config["adaptive"] and self.controller is None:
+            self.controller = AdaptiveController(
+                initial, self.config["adaptive_min_concurrency"], maximum,
+                self.config["timeout"], self.config["min_timeout"]
+            )
+        return self.controller
+
+    def make_async_limiter(self):
+        """Concurrency gate for the asyncio engine: fixed semaphore or adaptive limiter"""
+        controller = self.make_controller(self.config["concurrency"], self.config["adaptive_max_concurrency"])
+        if controller:
+            return AsyncLimiter(controller)
+        return asyncio.Semaphore(self.config["concurrency"])
+
+    def make_thread_limiter(self):
+        """Concurrency gate for worker threads; only limits anything in adaptive mode"""
+        controller = self.make_controller(self.config["thread_count"], self.config["thread_count"])
+        self.thread_limiter = ThreadLimiter(controller) if controller else contextlib.nullcontext()
+
+    async def resolve_target(self):
+        """Resolve the test URL's host to IPv4 once per run for SOCKS handshakes
+
+        SOCKS4 needs an address, and SOCKS5 gets one too because requests resolves
+        socks5:// targets locally in the threads engine. Left unresolved on failure,
+        so each SOCKS4 check reports the DNS error itself and SOCKS5 sends the name.
+        """
+        _, host, port, _ = parse_target(self.config["test_url"])
+        if host in self.target_addresses or IPV4_RE.match(host):
+            return
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, port, family=socket.AF_INET, type=socket.SOCK_STREAM)
+        except OSError:
+            return
+        self.target_addresses[host] = infos[0][4][0]
+
+    async def run_async_checks(self, candidates, working_lists, failed_lists):
+        """Check (protocol, proxy) pairs concurrently on one event loop, bounded by a global limiter"""
+        await self.resolve_target()
+        limiter = self.make_async_limiter()
+        await asyncio.gather(*(
+            self.scheduled_check(proto, proxy, working_lists, failed_lists, limiter)
+            for proto, proxy in candidates
+        ))
+
+    async def prefilter_batch(self, candidates, failed_lists):
+        """Connect-probe a batch of candidates under one shared deadline, returning survivors"""
+        _, host, port, _ = parse_target(self.config["test_url"])
+        handshake = self.config["prefilter_handshake"]
+        if handshake:
+            await self.resolve_target()
+            host = self.target_addresses.get(host, host)
+            handshake = bool(IPV4_RE.match(host))
+
+        tasks = {
+            asyncio.create_task(tcp_probe(proto, proxy, host, port, handshake)): (proto, proxy)
+            for proto, proxy in candidates
+        }
+        done, pending = await asyncio.wait(tasks, timeout=self.config["prefilter_timeout"])
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        survivors = set()
+        for task, (proto, proxy) in tasks.items():
+            if task in pending:
+                self.add_failed(failed_lists[proto], proto, proxy, f"Pre-filter: no answer within {self.config['prefilter_timeout']}s")
+            elif task.exception() is not None:
+                error = task.exception()
+                self.add_failed(failed_lists[proto], proto, proxy, f"Pre-filter: {str(error) or type(error).__name__}")
+            else:
+                survivors.add((proto, proxy))
+        return [item for item in candidates if item in survivors]
+
+    def prefilter(self, candidates, failed_lists):
+        """Run the TCP connect pre-filter over candidates in batches"""
+        size = self.config["prefilter_batch"]
+        survivors = []
+        for start in range(0, len(candidates), size):
+            survivors.extend(asyncio.run(self.prefilter_batch(candidates[start:start + size], failed_lists)))
+        return survivors
+
+    def run_thread_checks(self, candidates, working_lists, failed_lists):
+        """Check (protocol, proxy) pairs with a pool of worker threads"""
+        self.make_thread_limiter()
+        queue = Queue()
+        for item in candidates:
+            queue.put(item)
+
+        threads = []
+        for _ in range(min(self.config["thread_count"], len(candidates))):
+            thread = threading.Thread(
+                target=self.worker,
+                args=(queue, working_lists, failed_lists)
+            )
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        # Wait for all threads to complete
+        for thread in threads:
+            thread.join()
+
+    def worker(self, queue, working_lists, failed_lists):
+        """Worker function for threads"""
+        while not queue.empty():
+            try:
+                proto, proxy = queue.get(timeout=1)
+                if proto not in self.done_protocols:
+                    self.check_proxy(proto, proxy, working_lists[proto], failed_lists[proto])
+                queue.task_done()
+            except:
+                break
+
+    def show_progress_bar(self, current, total, prefix="Progress", suffix="", length=40):
+        """Show progress bar"""
+        if total == 0:
+            return
+        percent = (current / total) * 100
+        filled_length = int(length * current // total)
+        bar = '█' * filled_length + '░' * (length - filled_length)
+        print(f'\r{Fore.CYAN}{prefix} |{Fore.GREEN}{bar}{Fore.CYAN}| {percent:.1f}% {suffix}', end='', flush=True)
+
+    def test_proxies(self, protocol=None):
+        """Test proxies of one protocol, a list of protocols, or every configured one"""
+        if self.interactive:
+            self.clear_screen()
+            self.print_banner()
+        
+        if isinstance(protocol, str):
+            protocols_to_test = [protocol]
+        else:
+            protocols_to_test = list(protocol or self.urls.keys())
+        
+        print(f"{Fore.YELLOW}🚀 Starting proxy testing...")
+        print(f"{Fore.CYAN}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+        
+        self.stats = {
+            "total": 0, "tested": 0, "working": 0, "failed": 0, "skipped": 0,
+            "sources": 0, "source_errors": 0, "stale_sources": 0, "cancelled": 0, "filtered": 0,
+            "start_time": time.time()
+        }
+        self.proxy_filter = ProxyFilter.from_config(self.config)
+        self.source_counts = {proto: 0 for proto in protocols_to_test}
+        self.quotas = {proto: n for proto, n in self.config["quotas"].items() if n and proto in self.source_counts}
+        self.done_protocols = set()
+        self.cancel_requested = False
+        self.cancelled_protocols = set()
+        self.inflight = {}
+        self.working_proxies.clear()
+        self.failed_proxies.clear()
+        self.index = ProxyIndex(self.config["dedup_across_protocols"])
+        self.target_addresses = {}
+        self.controller = None
+        self.metrics = CheckMetrics()
+
+        if self.config["engine"] in ("asyncio", "processes"):
+            raise_fd_limit()
+
+        if self.config["health_store"]:
+            self.health_store = ProxyHealthStore(self.config["health_db"])
+
+        if self.config["stream_export"]:
+            self.result_writer = self.open_result_writer(self.config["results_file"])
+
+        if self.config["profile"]:
+            self.profile_stage = ProfileStage(self)
+            self.profile_stage.start()
+
+        stop_reporter = threading.Event()
+        reporter = threading.Thread(target=self.report_progress, args=(stop_reporter,), daemon=True)
+        reporter.start()
+
+        try:
+            if self.config["streaming"]:
+                self.test_proxies_streaming(protocols_to_test)
+            else:
+                self.test_proxies_batch(protocols_to_test)
+        finally:
+            if self.profile_stage:
+                print(f"\n{Fore.YELLOW}📏 Finishing quality profiles...")
+                self.profile_stage.close()
+                self.profile_stage = None
+                self.working_proxies.sort(key=lambda r: r.profile.score if r.profile else -1, reverse=True)
+            stop_reporter.set()
+            reporter.join()
+            if self.health_store:
+                self.health_store.close()
+                self.health_store = None
+            if self.result_writer:
+                self.result_writer.close()
+                print(f"\n{Fore.GREEN}📂 Streamed {self.result_writer.count} results to {self.result_writer.path}")
+                self.result_writer = None
+            # Quotas only apply within a run; service mode re-checks are never cut short
+            self.stats["quotas_met"] = sorted(self.done_protocols - self.cancelled_protocols)
+            self.quotas = {}
+            self.done_protocols = set()
+
+        self.stats["duplicates"] = self.index.duplicates
+        self.stats["malformed"] = self.index.malformed
+        self.stats["end_time"] = time.time()
+        if self.config["metrics_file"]:
+            self.write_metrics()
+        self.show_final_results()
+
+    def open_result_writer(self, path="", prefix="results"):
+        """Open a writer for the configured export format, naming the file after the run if needed"""
+        writer_class = RESULT_WRITERS.get(self.config["export_format"], ResultWriter)
+        if not path:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            path = f"{prefix}_{timestamp}.{writer_class.extension}"
+        rotate_bytes = int(self.config["export_rotate_mb"] * 1024 * 1024)
+        return writer_class(path, self.config["export_batch"], rotate_bytes)
+
+    def iter_results(self, protocol=None):
+        """Run a check in the background and yield each result record as it completes
+
+        At most queue_size results wait for the caller; a slower caller holds the
+        checks back. Stopping the iteration early cancels the run and waits for it.
+        """
+        results = Queue(maxsize=self.config["queue_size"])
+        done = object()
+        errors = []
+
+        def deliver(record):
+            # Wait for room while the caller is still reading; drop records once it has stopped
+            while not self.cancel_requested:
+                try:
+                    results.put(record, timeout=0.2)
+                    return
+                except Full:
+                    pass
+
+        def run():
+            try:
+                self.test_proxies(protocol)
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                deliver(done)
+
+        self.on_result = deliver
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        finished = False
+        try:
+            while True:
+                item = results.get()
+                if item is done:
+                    finished = True
+                    break
+                yield item
+        finally:
+            self.on_result = None
+            if not finished:
+                self.cancel()
+            thread.join()
+        if errors:
+            raise errors[0]
+
+    def recheck(self, candidates):
+        """Check specific (protocol, proxy) pairs with the configured engine, outside a full run"""
+        working_lists = {proto: [] for proto in PROTOCOLS}
+        failed_lists = {proto: FailureSummary(0) for proto in PROTOCOLS}
+        if self.config["engine"] == "threads":
+            self.run_thread_checks(candidates, working_lists, failed_lists)
+        else:
+            asyncio.run(self.run_async_checks(candidates, working_lists, failed_lists))
+
+    def serve(self, host=None, port=None, stop=None):
+        """Run as a service: refresh sources on a schedule, re-probe pool members and answer API queries
+
+        Blocks until stop (a threading.Event) is set or the process is interrupted.
+        """
+        host = self.config["api_host"] if host is None else host
+        port = self.config["api_port"] if port is None else port
+        stop = stop or threading.Event()
+        self.pool = ProxyPool(self.config["pool_max_failures"])
+        self.on_result = self.pool.update
+        server = ThreadingHTTPServer((host, port), PoolRequestHandler)
+        server.daemon_threads = True
+        server.pool = self.pool
+        self.api_address = server.server_address
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"{Fore.GREEN}🌐 Serving the proxy pool on http://{host}:{server.server_port}/proxies")
+
+        next_refresh = 0
+        try:
+            while not stop.is_set():
+                now = time.time()
+                if now >= next_refresh:
+                    self.test_proxies()
+                    self.pool.refreshed = time.time()
+                    next_refresh = self.pool.refreshed + self.config["refresh_interval"]
+                    continue
+                due = self.pool.due(now, self.config["pool_recheck_interval"], self.config["pool_recheck_batch"])
+                if due:
+                    self.recheck(due)
+                else:
+                    stop.wait(min(1.0, next_refresh - now))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
+            server.server_close()
+            self.on_result = None
+
+    def report_progress(self, stop):
+        """Redraw the progress bar and refresh the metrics file until stop is set"""
+        interval = self.config["progress_interval"]
+        if interval <= 0:
+            return
+        show_bar = not self.config["print_results"]
+        while not stop.wait(interval):
+            if show_bar:
+                elapsed = time.time() - self.stats["start_time"]
+                tested = self.stats["tested"]
+                self.show_progress_bar(
+                    tested, max(self.stats["total"], tested),
+                    suffix=f"{tested}/{self.stats['total']} • {tested / elapsed:.0f}/s • {self.stats['working']} working"
+                )
+            if self.config["metrics_file"]:
+                self.write_metrics()
+        if show_bar:
+            print()
+
+    def write_metrics(self):
+        """Atomically replace the metrics file with the current metrics"""
+        if self.config["metrics_format"] == "json":
+            content = json.dumps(dict(self.metrics.to_json(), stats=self.stats), indent=2)
+        else:
+            content = self.metrics.to_prometheus()
+        part_path = self.config["metrics_file"] + ".part"
+        with open(part_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(part_path, self.config["metrics_file"])
+
+    def test_proxies_batch(self, protocols_to_test):
+        """Download every list completely (all sources at once), then check one protocol at a time"""
+        working_lists = {proto: [] for proto in PROTOCOLS}
+        failed_lists = {proto: FailureSummary(self.config["failed_sample"]) for proto in PROTOCOLS}
+        candidates = {proto: [] for proto in PROTOCOLS}
+
+        print(f"\n{Fore.MAGENTA}📡 Fetching {', '.join(p.upper() for p in protocols_to_test)} proxies...")
+        self.fetch_sources(protocols_to_test, lambda item, source: candidates[item[0]].append(item), working_lists, failed_lists)
+
+        for proto in protocols_to_test:
+            if proto in self.done_protocols:
+                continue
+            print(f"\n{Fore.YELLOW}🔍 Testing {len(candidates[proto])} {proto.upper()} proxies...")
+            print(f"{Fore.CYAN}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+
+            if self.config["engine"] == "asyncio":
+                asyncio.run(self.run_async_checks(candidates[proto], working_lists, failed_lists))
+            elif self.config["engine"] == "processes":
+                size = self.config["shard_size"]
+                shards = [candidates[proto][i:i + size] for i in range(0, len(candidates[proto]), size)]
+                with self.open_process_pool() as pool:
+                    self.merge_shard_results(pool, shards, working_lists, failed_lists, protocols=[proto])
+            else:
+                self.run_thread_checks(candidates[proto], working_lists, failed_lists)
+
+        for proto in PROTOCOLS:
+            self.save_protocol_results(proto, working_lists[proto], failed_lists[proto])
+
+    def save_protocol_results(self, proto, working_list, failed_list):
+        """Write a protocol's working proxies to disk and merge its results"""
+        if working_list:
+            filename = f"{proto}_working_proxies.txt"
+            with open(filename, "w", encoding="utf-8") as f:
+                for item in working_list:
+                    f.write(f"{item.proxy}\n")
+            print(f"\n{Fore.GREEN}📂 Saved {len(working_list)} working proxies to {filename}")
+
+        self.working_proxies.extend(working_list)
+        self.failed_proxies.merge(failed_list)
+
+    def sources(self, protocols):
+        """Expand self.urls into ProxySource objects for the given protocols"""
+        sources = []
+        for proto in protocols:
+            specs = self.urls.get(proto, [])
+            if isinstance(specs, (str, dict, ProxySource)):
+                specs = [specs]
+            sources.extend(ProxySource.from_spec(proto, spec) for spec in specs)
+        return sources
+
+    def read_source(self, source):
+        """Yield the entries of one source, from disk or the network, through its parser"""
+        bulk = source.parser == "plain"
+        if source.is_file and bulk and self.use_bulk(source.location):
+            yield from source.parse(self.read_bulk(source.location))
+        elif source.is_file:
+            with open(source.location, "rb") as f:
+                lines = (raw.decode("utf-8", "ignore").strip() for raw in f)
+                yield from source.parse(line for line in lines if line)
+        else:
+            yield from source.parse(self.iter_source_lines(source.location, bulk))
+
+    def use_bulk(self, path):
+        """True if a plain list file is big enough for the bulk loader"""
+        return bool(self.config["bulk_min_bytes"]) and os.path.getsize(path) >= self.config["bulk_min_bytes"]
+
+    def read_bulk(self, path):
+        """Yield a big plain list's entries in file order from packed arrays, deduplicated and filtered up front"""
+        packed, repeats = load_proxy_file(path).unique()
+        with self.index.lock:
+            self.index.duplicates += repeats
+        if self.proxy_filter:
+            packed, dropped = packed.select(self.proxy_filter)
+            with self.lock:
+                self.stats["filtered"] += dropped
+        yield from packed
+
+    def replay_cache(self, body_path, bulk=False):
+        if bulk and self.use_bulk(body_path):
+            yield from self.read_bulk(body_path)
+            return
+        with open(body_path, "rb") as f:
+            for line in f:
+                line = line.decode("utf-8", "ignore").strip()
+                if line:
+                    yield line
+
+    def source_cache_paths(self, url):
+        """Return the cached body and metadata paths for a source URL"""
+        name = hashlib.sha1(url.encode()).hexdigest()[:16]
+        base = os.path.join(self.config["source_cache_dir"], name)
+        return base + ".txt", base + ".json"
+
+    def source_cache_lock(self, url):
+        """Lock guarding one URL's cached body and metadata, shared by sources with the same URL"""
+        with self.lock:
+            return self.cache_locks.setdefault(url, threading.Lock())
+
+    def iter_source_lines(self, url, bulk=False):
+        """Yield proxies from a source list line by line as it downloads
+
+        When a cache directory is configured the list is fetched with a conditional
+        GET and the cached copy is replayed if the server answers 304 Not Modified,
+        if it is younger than source_max_age, or if the download fails. With bulk
+        set, a big cached copy is replayed through read_bulk().
+        """
+        cache_dir = self.config["source_cache_dir"]
+        request_headers = {}
+        cached = False
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            body_path, meta_path = self.source_cache_paths(url)
+            with self.source_cache_lock(url):
+                cached = os.path.exists(body_path) and os.path.exists(meta_path)
+                if cached:
+                    with open(meta_path, encoding="utf-8") as f:
+                        meta = json.load(f)
+            if cached:
+                if time.time() - meta.get("fetched_at", 0) < self.config["source_max_age"]:
+                    yield from self.replay_cache(body_path, bulk)
+                    return
+                if meta.get("etag"):
+                    request_headers["If-None-Match"] = meta["etag"]
+                if meta.get("last_modified"):
+                    request_headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            response = self.get_source_session().get(
+                url, headers=request_headers, timeout=self.config["source_timeout"], stream=True,
+                **self.direct_request_options(url)
+            )
+            if response.status_code != 304 and not response.ok:
+                response.close()
+                response.raise_for_status()
+        except requests.RequestException as e:
+            if not cached:
+                raise
+            print(f"{Fore.YELLOW}⚠️  {url} failed ({e}), using the cached copy")
+            with self.lock:
+                self.stats["stale_sources"] += 1
+            yield from self.replay_cache(body_path, bulk)
+            return
+
+        with response:
+            if response.status_code == 304:
+                yield from self.replay_cache(body_path, bulk)
+                return
+
+            response.raise_for_status()
+            if not cache_dir:
+                for line in response.iter_lines():
+                    line = line.decode("utf-8", "ignore").strip()
+                    if line:
+                        yield line
+                return
+
+            lines = response.iter_lines()
+            # A private part file per download, so sources sharing the URL can't clobber each other
+            fd, part_path = tempfile.mkstemp(suffix=".part", dir=cache_dir)
+            complete = False
+            failure = None
+            with os.fdopen(fd, "wb") as cache:
+                try:
+                    for raw in lines:
+                        cache.write(raw + b"\n")
+                        line = raw.decode("utf-8", "ignore").strip()
+                        if line:
+                            yield line
+                    complete = True
+                except GeneratorExit:
+                    # The caller has enough proxies; finish the download so the cache stays whole
+                    try:
+                        for raw in lines:
+                            cache.write(raw + b"\n")
+                        complete = True
+                    except (requests.RequestException, OSError):
+                        pass
+                except requests.RequestException as e:
+                    failure = e
+
+            if not complete:
+                os.remove(part_path)
+                if failure is None:
+                    return
+                if not cached:
+                    raise failure
+                # Entries already yielded come round again; the index drops them as duplicates
+                print(f"{Fore.YELLOW}⚠️  {url} broke off ({failure}), using the cached copy")
+                with self.lock:
+                    self.stats["stale_sources"] += 1
+                yield from self.replay_cache(body_path, bulk)
+                return
+            with self.source_cache_lock(url):
+                os.replace(part_path, body_path)
+                with open(meta_path, "w", encoding="utf-8") as f:
+                    json.dump({
+                        "url": url,
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                        "fetched_at": time.time()
+                    }, f)
+
+    def take_slot(self, proto):
+        """Count one candidate against its protocol's max_proxies, shared by all sources"""
+        with self.lock:
+            if self.source_counts.get(proto, self.config["max_proxies"]) >= self.config["max_proxies"]:
+                return False
+            self.source_counts[proto] += 1
+            self.stats["total"] += 1
+            return True
+
+    def fetch_sources(self, protocols, put, working_lists, failed_lists):
+        """Fetch every source of the given protocols concurrently, one thread each, feeding put()"""
+        sources = self.sources(protocols)
+        self.get_source_session(len(sources))
+        fetchers = [
+            threading.Thread(target=self.fetch_into_queue, args=(source, put, working_lists, failed_lists), daemon=True)
+            for source in sources
+        ]
+        with self.lock:
+            self.stats["sources"] += len(fetchers)
+        for thread in fetchers:
+            thread.start()
+        for thread in fetchers:
+            thread.join()
+
+    def fetch_into_queue(self, source, put, working_lists, failed_lists):
+        """Stream one source's entries into the work queue through put(item, source)"""
+        print(f"{Fore.MAGENTA}📡 Fetching {source.name}...")
+        count = 0
+        pending = []
+
+        def flush():
+            for survivor in self.prefilter(pending, failed_lists):
+                put(survivor, source)
+            pending.clear()
+
+        try:
+            entries = self.read_source(source)
+            for line in entries:
+                if self.cancel_requested:
+                    break
+                item = self.index.add(line, source.protocol)
+                if item is None or item[0] not in self.source_counts:
+                    continue
+                if self.proxy_filter and not self.proxy_filter.allows(*split_proxy(item[1])):
+                    with self.lock:
+                        self.stats["filtered"] += 1
+                    continue
+                if item[0] in self.done_protocols or not self.take_slot(item[0]):
+                    if item[0] == source.protocol:
+                        break
+                    continue
+                count += 1
+                if not self.select_for_check(*item, working_lists[item[0]]):
+                    continue
+                if self.config["prefilter"]:
+                    pending.append(item)
+                    if len(pending) >= self.config["prefilter_batch"]:
+                        flush()
+                else:
+                    put(item, source)
+            entries.close()
+            if pending:
+                flush()
+            print(f"{Fore.GREEN}✅ Fetched {count} proxies from {source.name}")
+        except Exception as e:
+            with self.lock:
+                self.stats["source_errors"] += 1
+            print(f"{Fore.RED}❌ Error fetching {source.name}: {e}")
+
+    def stream_worker(self, queue, working_lists, failed_lists):
+        """Worker thread for the streaming pipeline; stops once the FairQueue is closed and drained"""
+        while True:
+            item = queue.get()
+            if item is None:
+                break
+            proto, proxy = item
+            if proto not in self.done_protocols:
+                self.check_proxy(proto, proxy, working_lists[proto], failed_lists[proto])
+
+    def run_streaming_threads(self, protocols, working_lists, failed_lists):
+        """Fetch all lists concurrently and feed a shared pool of worker threads
+
+        Threads can't abandon a request, so checks already running when a quota
+        is met finish and their results are discarded.
+        """
+        self.make_thread_limiter()
+        queue = self.work_queue = FairQueue(self.config["queue_size"], self.config["protocol_weights"])
+        workers = [
+            threading.Thread(target=self.stream_worker, args=(queue, working_lists, failed_lists), daemon=True)
+            for _ in range(self.config["thread_count"])
+        ]
+        for thread in workers:
+            thread.start()
+
+        self.fetch_sources(protocols, queue.put, working_lists, failed_lists)
+        queue.close()
+        for thread in workers:
+            thread.join()
+        self.work_queue = None
+
+    async def run_streaming_async(self, protocols, working_lists, failed_lists):
+        """Fetch all lists in threads and feed checker tasks on the event loop"""
+        loop = asyncio.get_running_loop()
+        work = self.work_queue = FairQueue(self.config["queue_size"], self.config["protocol_weights"])
+        # Small hand-off buffer so the FairQueue, not this one, decides the order
+        queue = asyncio.Queue(maxsize=self.config["concurrency"])
+        limiter = self.make_async_limiter()
+        consumer_count = self.config["adaptive_max_concurrency"] if self.controller else self.config["concurrency"]
+        await self.resolve_target()
+
+        def fetch_all():
+            self.fetch_sources(protocols, work.put, working_lists, failed_lists)
+            work.close()
+
+        def pump():
+            while True:
+                item = work.get()
+                if item is None:
+                    return
+                asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        async def consume():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                proto, proxy = item
+                await self.scheduled_check(proto, proxy, working_lists, failed_lists, limiter)
+
+        consumers = [asyncio.create_task(consume()) for _ in range(consumer_count)]
+        await asyncio.gather(loop.run_in_executor(None, fetch_all), loop.run_in_executor(None, pump))
+        for _ in consumers:
+            await queue.put(None)
+        await asyncio.gather(*consumers)
+        self.work_queue = None
+
+    def open_process_pool(self):
+        """Start worker processes that each run the asyncio engine on their shards
+
+        Workers come from a fork server (or are spawned where there is none), never forked
+        from this process: the reporter, profiler and fetcher threads may be running here,
+        and a fork would copy the locks they hold.
+        """
+        config = dict(self.config, engine="asyncio", health_store=False, prefilter=False, print_results=False)
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        return multiprocessing.get_context(method).Pool(
+            self.config["process_count"] or os.cpu_count(),
+            initializer=init_shard_worker,
+            initargs=(config, self.headers)
+        )
+
+    def merge_shard_results(self, pool, shards, working_lists, failed_lists, slots=None, protocols=None):
+        """Feed shards to the pool and merge the compact results as each one completes
+
+        Stops early once the quotas of protocols (default: the whole run) are met;
+        leaving the pool's context then terminates the workers along with the shards
+        they were checking. slots, if given, is released once per finished shard.
+        """
+        for working, failed, metrics in pool.imap_unordered(check_shard, shards):
+            if slots:
+                slots.release()
+            self.metrics.merge(metrics)
+            for proto, proxy, response_time in working:
+                self.add_working(working_lists[proto], proto, proxy, response_time)
+            for proto, proxy, reason in failed:
+                self.add_failed(failed_lists[proto], proto, proxy, reason)
+            if self.quotas_met(protocols):
+                break
+
+    def run_streaming_processes(self, protocols, working_lists, failed_lists):
+        """Fetch all lists in threads and shard the stream across worker processes"""
+        queue = self.work_queue = FairQueue(self.config["queue_size"], self.config["protocol_weights"])
+        size = self.config["shard_size"]
+        # Two shards per worker in flight keep the workers busy while the FairQueue's
+        # order and a met quota still take effect; the pool would otherwise take them all
+        slots = threading.Semaphore(2 * (self.config["process_count"] or os.cpu_count()))
+        stopped = threading.Event()
+
+        def claim():
+            while not slots.acquire(timeout=0.5):
+                if stopped.is_set():
+                    return False
+            return True
+
+        def shards():
+            shard = []
+            while not stopped.is_set():
+                try:
+                    item = queue.get(timeout=0.5)
+                except Empty:
+                    # Don't hold back a partial shard while the lists are slow to arrive
+                    if shard and claim():
+                        yield shard
+                        shard = []
+                    continue
+                if item is None:
+                    break
+                if item[0] in self.done_protocols:
+                    continue
+                shard.append(item)
+                if len(shard) >= size and claim():
+                    yield shard
+                    shard = []
+            if shard and claim():
+                yield shard
+
+        def fetch_all():
+            self.fetch_sources(protocols, queue.put, working_lists, failed_lists)
+            queue.close()
+
+        with self.open_process_pool() as pool:
+            threading.Thread(target=fetch_all, daemon=True).start()
+            try:
+                self.merge_shard_results(pool, shards(), working_lists, failed_lists, slots)
+            finally:
+                stopped.set()
+        self.work_queue = None
+
+    def test_proxies_streaming(self, protocols):
+        """Check proxies from all protocols while their lists are still downloading"""
+        print(f"{Fore.YELLOW}🔍 Streaming {', '.join(p.upper() for p in protocols)} proxies...")
+        print(f"{Fore.CYAN}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+
+        working_lists = {proto: [] for proto in PROTOCOLS}
+        failed_lists = {proto: FailureSummary(self.config["failed_sample"]) for proto in PROTOCOLS}
+
+        if self.config["engine"] == "asyncio":
+            asyncio.run(self.run_streaming_async(protocols, working_lists, failed_lists))
+        elif self.config["engine"] == "processes":
+            self.run_streaming_processes(protocols, working_lists, failed_lists)
+        else:
+            self.run_streaming_threads(protocols, working_lists, failed_lists)
+
+        for proto in PROTOCOLS:
+            self.save_protocol_results(proto, working_lists[proto], failed_lists[proto])
+
+    def show_final_results(self):
+        """Show final results"""
+        duration = self.stats["end_time"] - self.stats["start_time"]
+        success_rate = (self.stats["working"] / self.stats["total"]) * 100 if self.stats["total"] > 0 else 0
+        
+        print(f"\n{Fore.CYAN}╔══════════════════════════════════════════════════════════════╗")
+        print(f"{Fore.CYAN}║                        {Fore.YELLOW}Final Results{Fore.CYAN}                          ║")
+        print(f"{Fore.CYAN}╠══════════════════════════════════════════════════════════════╣")
+        print(f"{Fore.CYAN}║  {Fore.WHITE}Total Proxies:{Fore.GREEN} {self.stats['total']:<15} {Fore.CYAN}                     ║")
+        print(f"{Fore.CYAN}║  {Fore.WHITE}Working Proxies:{Fore.GREEN} {self.stats['working']:<13} {Fore.CYAN}                   ║")
+        print(f"{Fore.CYAN}║  {Fore.WHITE}Failed Proxies:{Fore.RED} {self.stats['failed']:<14} {Fore.CYAN}                    ║")
+        if self.stats.get("duplicates") or self.stats.get("malformed"):
+            print(f"{Fore.CYAN}║  {Fore.WHITE}Collapsed:{Fore.YELLOW} {self.stats['duplicates']} duplicates, {self.stats['malformed']} malformed{Fore.CYAN}               ║")
+        if self.controller:
+            timeouts = ", ".join(f"{p} {self.controller.timeout_for(p):.1f}s" for p in PROTOCOLS)
+            print(f"{Fore.CYAN}║  {Fore.WHITE}Adaptive:{Fore.MAGENTA} {self.controller.limit} in flight, {timeouts}{Fore.CYAN}  ║")
+        profiles = [r.profile for r in self.working_proxies if r.profile]
+        if profiles:
+            https = sum(1 for p in profiles if p.https)
+            elite = sum(1 for p in profiles if p.anonymity == "elite")
+            print(f"{Fore.CYAN}║  {Fore.WHITE}Profiled:{Fore.GREEN} {len(profiles)}, {https} HTTPS, {elite} elite, best score {profiles[0].score}{Fore.CYAN}        ║")
+        if self.failed_proxies.counts:
+            reasons = ", ".join(f"{code} {count}" for code, count in self.failed_proxies.top())
+            print(f"{Fore.CYAN}║  {Fore.WHITE}Top Failures:{Fore.RED} {reasons}{Fore.CYAN}                    ║")
+        if self.stats.get("source_errors") or self.stats.get("stale_sources"):
+            print(f"{Fore.CYAN}║  {Fore.WHITE}Sources:{Fore.YELLOW} {self.stats['sources']} total, {self.stats['source_errors']} failed, {self.stats['stale_sources']} from cache{Fore.CYAN}      ║")
+        if self.stats.get("quotas_met") or self.stats.get("cancelled"):
+            met = ", ".join(p.upper() for p in self.stats.get("quotas_met", [])) or "none"
+            print(f"{Fore.CYAN}║  {Fore.WHITE}Quotas met:{Fore.GREEN} {met}, {self.stats['cancelled']} checks cancelled{Fore.CYAN}          ║")
+        if self.stats.get("filtered"):
+            print(f"{Fore.CYAN}║  {Fore.WHITE}Filtered (network/port):{Fore.YELLOW} {self.stats['filtered']:<11} {Fore.CYAN}          ║")
+        if self.stats.get("skipped"):
+            print(f"{Fore.CYAN}║  {Fore.WHITE}Skipped (history):{Fore.YELLOW} {self.stats['skipped']:<11} {Fore.CYAN}                 ║")
+        print(f"{Fore.CYAN}║  {Fore.WHITE}Success Rate:{Fore.YELLOW} {success_rate:.1f}%{Fore.CYAN}                               ║")
+        print(f"{Fore.CYAN}║  {Fore.WHITE}Duration:{Fore.MAGENTA} {duration:.2f} seconds{Fore.CYAN}                           ║")
+        print(f"{Fore.CYAN}║  {Fore.WHITE}Speed:{Fore.MAGENTA} {self.stats['total']/duration:.2f} proxies/sec{Fore.CYAN}                  ║")
+        print(f"{Fore.CYAN}╚══════════════════════════════════════════════════════════════╝")
+        
+        if self.stats["working"] > 0:
+            print(f"\n{Fore.GREEN}🎉 Found {self.stats['working']} working proxies!")
+        else:
+            print(f"\n{Fore.RED}😞 No working proxies found")
+
+    def show_settings(self):
+        """Show current settings"""
+        self.clear_screen()
+        print(f"{Fore.CYAN}╔══════════════════════════════════════════════════════════════╗")
+        print(f"{Fore.CYAN}║                       {Fore.YELLOW}Current Settings{Fore.CYAN}                        ║")
+        print(f"{Fore.CYAN}╠══════════════════════════════════════════════════════════════╣")
+        print(f"{Fore.CYAN}║  {Fore.WHITE}Test URL:{Fore.GREEN} {self.config['test_url']:<35} {Fore.CYAN}          ║")
+        print(f"{Fore.CYAN}║  {Fore.WHITE}Max Proxies:{Fore.GREEN} {self.config['max_proxies']:<15} {Fore.CYAN}                    ║")
+        print(f"{Fore.CYAN}║  {Fore.WHITE}Thread Count:{Fore.GREEN} {self.config['thread_count']:<14} {Fore.CYAN}                   ║")
+        print(f"{Fore.CYAN}║  {Fore.WHITE}Timeout:{Fore.GREEN} {self.config['timeout']} seconds{Fore.CYAN}                            ║")
+        print(f"{Fore.CYAN}║  {Fore.WHITE}Save Logs:{Fore.GREEN} {'Yes' if self.config['save_logs'] else 'No'}{Fore.CYAN}                                ║")
+        print(f"{Fore.CYAN}║  {Fore.WHITE}Export Format:{Fore.GREEN} {self.config['export_format'].upper()}{Fore.CYAN}                             ║")
+        print(f"{Fore.CYAN}║  {Fore.WHITE}Engine:{Fore.GREEN} {self.config['engine']:<18} {Fore.CYAN}                               ║")
+        print(f"{Fore.CYAN}║  {Fore.WHITE}Async Concurrency:{Fore.GREEN} {self.config['concurrency']:<10} {Fore.CYAN}                        ║")
+        print(f"{Fore.CYAN}║  {Fore.WHITE}Health Store:{Fore.GREEN} {self.config['health_db'] if self.config['health_store'] else 'Off'}{Fore.CYAN}                             ║")
+        print(f"{Fore.CYAN}║  {Fore.WHITE}TCP Pre-filter:{Fore.GREEN} {str(self.config['prefilter_timeout']) + 's deadline' if self.config['prefilter'] else 'Off'}{Fore.CYAN}                      ║")
+        print(f"{Fore.CYAN}║  {Fore.WHITE}Adaptive Tuning:{Fore.GREEN} {'Yes' if self.config['adaptive'] else 'No'}{Fore.CYAN}                          ║")
+        print(f"{Fore.CYAN}║  {Fore.WHITE}Print Each Result:{Fore.GREEN} {'Yes' if self.config['print_results'] else 'No (progress bar)'}{Fore.CYAN}                 ║")
+        print(f"{Fore.CYAN}║  {Fore.WHITE}Metrics File:{Fore.GREEN} {self.config['metrics_file'] or 'Off'}{Fore.CYAN}                             ║")
+        print(f"{Fore.CYAN}║  {Fore.WHITE}Streaming:{Fore.GREEN} {'Yes' if self.config['streaming'] else 'No'}{Fore.CYAN}                                ║")
+        print(f"{Fore.CYAN}╚══════════════════════════════════════════════════════════════╝")
+
+    def modify_settings(self):
+        """Modify settings"""
+        self.clear_screen()
+        self.print_banner()
+        print(f"{Fore.YELLOW}⚙️  Modify Settings")
+        print(f"{Fore.CYAN}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+        
+        try:
+            print(f"{Fore.WHITE}1. Current test URL: {Fore.GREEN}{self.config['test_url']}")
+            new_url = input(f"{Fore.YELLOW}New test URL (leave empty to keep current): ").strip()
+            if new_url:
+                self.config['test_url'] = new_url
+            
+            print(f"{Fore.WHITE}2. Current max proxies: {Fore.GREEN}{self.config['max_proxies']}")
+            new_max = input(f"{Fore.YELLOW}New max proxies (leave empty to keep current): ").strip()
+            if new_max.isdigit():
+                self.config['max_proxies'] = int(new_max)
+            
+            print(f"{Fore.WHITE}3. Current thread count: {Fore.GREEN}{self.config['thread_count']}")
+            new_threads = input(f"{Fore.YELLOW}New thread count (leave empty to keep current): ").strip()
+            if new_threads.isdigit():
+                self.config['thread_count'] = int(new_threads)
+            
+            print(f"{Fore.WHITE}4. Current timeout: {Fore.GREEN}{self.config['timeout']} seconds")
+            new_timeout = input(f"{Fore.YELLOW}New timeout in seconds (leave empty to keep current): ").strip()
+            if new_timeout.replace('.','').isdigit():
+                self.config['timeout'] = float(new_timeout)
+            
+            print(f"{Fore.WHITE}5. Current engine: {Fore.GREEN}{self.config['engine']}")
+            new_engine = input(f"{Fore.YELLOW}New engine - threads/asyncio/processes (leave empty to keep current): ").strip().lower()
+            if new_engine in ("threads", "asyncio", "processes"):
+                self.config['engine'] = new_engine
+            
+            print(f"{Fore.WHITE}6. Current async concurrency: {Fore.GREEN}{self.config['concurrency']}")
+            new_concurrency = input(f"{Fore.YELLOW}New async concurrency (leave empty to keep current): ").strip()
+            if new_concurrency.isdigit():
+                self.config['concurrency'] = int(new_concurrency)
+            
+            print(f"{Fore.WHITE}7. Adaptive tuning: {Fore.GREEN}{'on' if self.config['adaptive'] else 'off'}")
+            new_adaptive = input(f"{Fore.YELLOW}Adaptive tuning - on/off (leave empty to keep current): ").strip().lower()
+            if new_adaptive in ("on", "off"):
+                self.config['adaptive'] = new_adaptive == "on"
+            
+            print(f"{Fore.WHITE}8. Current export format: {Fore.GREEN}{self.config['export_format']}")
+            new_format = input(f"{Fore.YELLOW}New export format - {'/'.join(RESULT_WRITERS)} (leave empty to keep current): ").strip().lower()
+            if new_format in RESULT_WRITERS:
+                self.config['export_format'] = new_format
+            
+            print(f"{Fore.GREEN}✅ Settings updated successfully!")
+            
+        except Exception as e:
+            print(f"{Fore.RED}❌ Error updating settings: {e}")
+
+    def export_results(self):
+        """Export results in the configured format, plus a JSON summary of the run"""
+        if not self.working_proxies:
+            print(f"{Fore.RED}❌ No results to export. Test proxies first.")
+            return
+        
+        self.clear_screen()
+        print(f"{Fore.YELLOW}📁 Export Results")
+        print(f"{Fore.CYAN}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        
+        # Export the working proxies in export_format
+        writer = self.open_result_writer(prefix="working_proxies")
+        for proxy in self.working_proxies:
+            writer.write(proxy)
+        if self.config["export_failed"]:
+            for proxy in self.failed_proxies.sample:
+                writer.write(proxy)
+        writer.close()
+        print(f"{Fore.GREEN}✅ Exported {writer.count} proxies to {writer.path}")
+        
+        # Export JSON summary; the records themselves are only in the file above
+        json_filename = f"proxy_report_{timestamp}.json"
+        report = {
+            "timestamp": datetime.now().isoformat(),
+            "stats": self.stats,
+            "results_file": writer.path,
+            "failure_reasons": self.failed_proxies.counts,
+            "failed_sample": [proxy.as_dict() for proxy in self.failed_proxies.sample]
+        }
+        with open(json_filename, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"{Fore.GREEN}✅ Exported run summary to {json_filename}")
+
+    def clear_memory(self):
+        """Clear memory"""
+        self.working_proxies.clear()
+        self.failed_proxies.clear()
+        self.stats = {"total": 0, "tested": 0, "working": 0, "failed": 0}
+        print(f"{Fore.GREEN}✅ Memory cleared successfully!")
+
+    def run(self):
+        """Run main program"""
+        while True:
+            self.clear_screen()
+            self.print_banner()
+            self.print_menu()
+            
+            try:
+                choice = input(f"{Fore.YELLOW}Choose from menu: ").strip()
+                
+                if choice == "1":
+                    self.test_proxies()
+                    input(f"\n{Fore.CYAN}Press any key to continue...")
+                    
+                elif choice == "2":
+                    print(f"{Fore.YELLOW}Available proxy types:")
+                    print(f"{Fore.GREEN}1. HTTP")
+                    print(f"{Fore.GREEN}2. SOCKS4") 
+                    print(f"{Fore.GREEN}3. SOCKS5")
+                    
+                    proto_choice = input(f"{Fore.YELLOW}Choose proxy type (1-3): ").strip()
+                    protocols = {"1": "http", "2": "socks4", "3": "socks5"}
+                    
+                    if proto_choice in protocols:
+                        self.test_proxies(protocols[proto_choice])
+                        input(f"\n{Fore.CYAN}Press any key to continue...")
+                    else:
+                        print(f"{Fore.RED}❌ Invalid choice!")
+                        time.sleep(2)
+                        
+                elif choice == "3":
+                    self.show_settings()
+                    input(f"\n{Fore.CYAN}Press any key to continue...")
+                    
+                elif choice == "4":
+                    self.modify_settings()
+                    input(f"\n{Fore.CYAN}Press any key to continue...")
+                    
+                elif choice == "5":
+                    if self.stats["total"] > 0:
+                        self.show_final_results()
+                    else:
+                        print(f"{Fore.RED}❌ No statistics available. Test proxies first.")
+                    input(f"\n{Fore.CYAN}Press any key to continue...")
+                    
+                elif choice == "6":
+                    self.export_results()
+                    input(f"\n{Fore.CYAN}Press any key to continue...")
+                    
+                elif choice == "7":
+                    self.clear_memory()
+                    input(f"\n{Fore.CYAN}Press any key to continue...")
+                    
+                elif choice == "0":
+                    print(f"{Fore.YELLOW}👋 Thank you for using Enhanced Proxy Checker!")
+                    print(f"{Fore.CYAN}Developed with ❤️ for the community")
+                    break
+                    
+                else:
+                    print(f"{Fore.RED}❌ Invalid choice! Choose a number from 0-7")
+                    time.sleep(2)
+                    
+            except KeyboardInterrupt:
+                print(f"\n{Fore.YELLOW}👋 Program stopped by user")
+                break
+            except Exception as e:
+                print(f"{Fore.RED}❌ Unexpected error: {e}")
+                time.sleep(3)
+
+shard_checker = None
+
+
+def init_shard_worker(config, headers):
+    """Set up a worker process for the processes engine"""
+    global shard_checker
+    sys.stdout = open(os.devnull, "w", encoding="utf-8")
+    raise_fd_limit()
+    shard_checker = ProxyChecker(config, interactive=False)
+    shard_checker.headers = headers
+
+
+def check_shard(shard):
+    """Check a shard of (protocol, proxy) pairs, returning compact working and failed tuples"""
+    working_lists = {proto: [] for proto in PROTOCOLS}
+    # Every failure goes back to the parent, so the shard's sample must hold all of them
+    failed_lists = {proto: FailureSummary(len(shard)) for proto in PROTOCOLS}
+    shard_checker.metrics = CheckMetrics()
+    asyncio.run(shard_checker.run_async_checks(shard, working_lists, failed_lists))
+    working = [(r.protocol, r.proxy, r.response_time) for proto in PROTOCOLS for r in working_lists[proto]]
+    failed = [(r.protocol, r.proxy, r.reason) for proto in PROTOCOLS for r in failed_lists[proto].sample]
+    return working, failed, shard_checker.metrics.snapshot()
+
+
+def parse_args(argv):
+    """Parse headless command line options"""
+    parser = argparse.ArgumentParser(
+        description="Check HTTP/SOCKS4/SOCKS5 proxy lists. Run without arguments for the interactive menu."
+    )
+    parser.add_argument("--headless", action="store_true", help="run with defaults, without the menu")
+    parser.add_argument("--serve", nargs="?", const="", metavar="HOST:PORT",
+                        help="keep a live pool and serve it over a local HTTP API (default 127.0.0.1:8899)")
+    parser.add_argument("-c", "--config", help="JSON file with settings (same keys as the menu) and optional \"urls\"")
+    parser.add_argument("-p", "--protocols", help="comma separated protocols to check (default: all sources)")
+    parser.add_argument("-s", "--source", action="append", default=[], metavar="PROTO[:PARSER]=URL|PATH",
+                        help="source list for a protocol, replacing the defaults; repeat to add more "
+                             "(parsers: plain, scheme, json)")
+    parser.add_argument("-e", "--engine", choices=("threads", "asyncio", "processes"))
+    parser.add_argument("-n", "--concurrency", type=int, help="worker threads, or in-flight checks for asyncio")
+    parser.add_argument("-t", "--timeout", type=float)
+    parser.add_argument("-m", "--max-proxies", type=int)
+    parser.add_argument("--quota", action="append", default=[], metavar="PROTO=N",
+                        help="stop checking a protocol once N of its proxies work; repeat per protocol")
+    parser.add_argument("--weight", action="append", default=[], metavar="PROTO=W",
+                        help="relative share of checks for a protocol while streaming (default 1)")
+    parser.add_argument("--test-url")
+    parser.add_argument("--allow-net", action="append", default=[], metavar="CIDR",
+                        help="only check proxies inside this network; repeat to add more")
+    parser.add_argument("--deny-net", action="append", default=[], metavar="CIDR",
+                        help="never check proxies inside this network; repeat to add more")
+    parser.add_argument("--ports", help="comma separated ports to keep, e.g. 80,8080,1080")
+    parser.add_argument("-o", "--output", default="-", help="write results here as they complete (default: stdout)")
+    parser.add_argument("-f", "--format", choices=("txt", "jsonl", "csv", "bin"), default="txt",
+                        help="bin needs --output")
+    parser.add_argument("--all", action="store_true", help="write failed results too")
+    parser.add_argument("--profile", action="store_true",
+                        help="also measure HTTPS support, anonymity, TTFB and throughput of working proxies")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no log output, only results")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Command line entry point; returns the process exit code
+
+    0 when working proxies were found, 1 when none were, 2 for bad arguments or
+    configuration and 3 when no source list could be fetched.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        ProxyChecker().run()
+        return 0
+
+    args = parse_args(argv)
+    checker = ProxyChecker(interactive=False)
+    try:
+        if args.config:
+            with open(args.config, encoding="utf-8") as f:
+                settings = json.load(f)
+            checker.urls.update(settings.pop("urls", {}))
+            checker.config.update(settings)
+        replaced = set()
+        for source in args.source:
+            name, sep, location = source.partition("=")
+            proto, _, parser = name.partition(":")
+            if not sep or proto not in PROTOCOLS:
+                raise ValueError(f"invalid --source {source!r}, expected PROTO[:PARSER]=URL|PATH")
+            if proto not in replaced:
+                checker.urls[proto] = []
+                replaced.add(proto)
+            checker.urls[proto].append(ProxySource(proto, location, parser or "plain"))
+        for option, key, kind in ((args.quota, "quotas", int), (args.weight, "protocol_weights", float)):
+            for value in option:
+                proto, sep, number = value.partition("=")
+                if not sep or proto not in PROTOCOLS:
+                    raise ValueError(f"invalid {value!r}, expected PROTO=NUMBER")
+                if kind(number) <= 0:
+                    raise ValueError(f"invalid {value!r}, the number must be positive")
+                checker.config[key] = dict(checker.config[key], **{proto: kind(number)})
+        if args.allow_net:
+            checker.config["allow_networks"] = list(checker.config["allow_networks"]) + args.allow_net
+        if args.deny_net:
+            checker.config["deny_networks"] = list(checker.config["deny_networks"]) + args.deny_net
+        if args.ports:
+            checker.config["allow_ports"] = [int(port) for port in args.ports.split(",")]
+        ProxyFilter.from_config(checker.config)  # reject bad networks and ports up front
+        protocols = args.protocols.split(",") if args.protocols else None
+        for proto in protocols or ():
+            if proto not in checker.urls:
+                raise ValueError(f"no source configured for protocol {proto!r}")
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    if args.engine:
+        checker.config["engine"] = args.engine
+    if args.concurrency:
+        key = "thread_count" if checker.config["engine"] == "threads" else "concurrency"
+        checker.config[key] = args.concurrency
+    if args.timeout:
+        checker.config["timeout"] = args.timeout
+    if args.max_proxies:
+        checker.config["max_proxies"] = args.max_proxies
+    if args.test_url:
+        checker.config["test_url"] = args.test_url
+    if args.profile:
+        checker.config["profile"] = True
+    if args.serve is not None:
+        host, _, port = args.serve.rpartition(":")
+        checker.config.update(print_results=False, stream_export=False)
+        log = open(os.devnull, "w", encoding="utf-8") if args.quiet else sys.stderr
+        with contextlib.redirect_stdout(log):
+            checker.serve(host or None, int(port) if port else None)
+        return 0
+
+    if args.format == "bin" and args.output == "-":
+        print("error: --format bin needs --output", file=sys.stderr)
+        return 2
+    checker.config.update(
+        print_results=False,
+        stream_export=args.output != "-",
+        results_file=args.output,
+        # The command line's txt keeps the scheme, since its output mixes protocols
+        export_format="uri" if args.format == "txt" else args.format,
+        export_failed=args.all,
+    )
+
+    # Results own stdout; everything the checker prints goes to stderr (or nowhere)
+    output = sys.stdout
+    log = open(os.devnull, "w", encoding="utf-8") if args.quiet else sys.stderr
+    try:
+        with contextlib.redirect_stdout(log):
+            if checker.config["stream_export"]:
+                checker.test_proxies(protocols)
+            else:
+                writer_class = RESULT_WRITERS[checker.config["export_format"]]
+                output.write(writer_class.header.decode("utf-8"))
+                for record in checker.iter_results(protocols):
+                    if args.all or record.status != "failed":
+                        output.write(writer_class.encode(record) + "\n")
+                        output.flush()
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if log is not sys.stderr:
+            log.close()
+
+    if checker.stats["sources"] and checker.stats["source_errors"] >= checker.stats["sources"]:
+        return 3
+    return 0 if checker.stats["working"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
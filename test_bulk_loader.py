@@ -0,0 +1,126 @@
+"""The bulk loader must agree with the line-by-line path: same entries, same order, same counts"""
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+import proxy_checker
+from proxy_checker import ProxyFilter, ProxyIndex, load_proxy_file, parse_plain, split_proxy
+
+
+def random_line(rng, seen):
+    """One list line: mostly bare IPv4:port, with repeats and everything the packer must hand back"""
+    ip = f"{rng.randrange(1, 224)}.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}"
+    port = rng.choice((80, 8080, 3128, 1080, rng.randrange(1, 65536)))
+    kind = rng.random()
+    if kind < 0.55:
+        line = f"{ip}:{port}"
+    elif kind < 0.70 and seen:
+        line = rng.choice(seen)
+    elif kind < 0.74:
+        line = f"{rng.choice(('http', 'socks5', 'https'))}://{ip}:{port}"
+    elif kind < 0.77:
+        line = f"proxy-{rng.randrange(50)}.example.com:{port}"
+    elif kind < 0.79:
+        line = f"[2001:db8::{rng.randrange(65536):x}]:{port}"
+    elif kind < 0.81:
+        line = f"user{rng.randrange(5)}:pw@{ip}:{port}"
+    elif kind < 0.83:
+        line = f"{ip}:{port} # checked yesterday"
+    elif kind < 0.85:
+        line = f"  {ip}:{port}\t"
+    elif kind < 0.87:
+        line = f"{ip}:{rng.choice((0, 65536, 99999))}"
+    elif kind < 0.89:
+        line = f"0{ip}:{port}"
+    elif kind < 0.91:
+        line = f"{ip}:{port:05d}"
+    elif kind < 0.93:
+        line = "# comment " + ip
+    elif kind < 0.95:
+        line = ""
+    elif kind < 0.97:
+        line = rng.choice(("garbage", "1.2.3:80", "1.2.3.4.5:80", "256.1.1.1:80", "1.2.3.4:", ":80"))
+    else:
+        line = f"10.{rng.randrange(4)}.{rng.randrange(256)}.1:{port}"
+    if line and not line.startswith(" "):
+        seen.append(line)
+    return line
+
+
+def line_path(path, proxy_filter=None):
+    """What read_source() does for a plain file below bulk_min_bytes"""
+    index = ProxyIndex()
+    entries = []
+    with open(path, "rb") as f:
+        lines = (raw.decode("utf-8", "ignore").strip() for raw in f)
+        for line in parse_plain(line for line in lines if line):
+            item = index.add(line, "http")
+            if item and (proxy_filter is None or proxy_filter.allows(*split_proxy(item[1]))):
+                entries.append(item)
+    return entries, index.duplicates, index.malformed
+
+
+def bulk_path(path, proxy_filter=None):
+    """What read_bulk() and fetch_into_queue() do for a big plain file"""
+    packed, repeats = load_proxy_file(path).unique()
+    if proxy_filter:
+        packed, _ = packed.select(proxy_filter)
+    index = ProxyIndex()
+    entries = []
+    for line in parse_plain(packed):
+        item = index.add(line, "http")
+        if item and (proxy_filter is None or proxy_filter.allows(*split_proxy(item[1]))):
+            entries.append(item)
+    return entries, repeats + index.duplicates, index.malformed
+
+
+class BulkLoaderTest(unittest.TestCase):
+    lines = 200_000
+
+    @classmethod
+    def setUpClass(cls):
+        rng = random.Random(1)
+        seen = []
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.directory.name, "list.txt")
+        with open(cls.path, "wb") as f:
+            for i in range(cls.lines):
+                # Mix line endings and leave the last line unterminated
+                end = b"\r\n" if i % 7 == 0 else b"\n"
+                f.write(random_line(rng, seen).encode() + (end if i < cls.lines - 1 else b""))
+        cls.expected = line_path(cls.path)
+        cls.proxy_filter = ProxyFilter(deny_networks=["10.0.0.0/8", "192.168.0.0/16"], ports=[80, 8080, 3128, 1080])
+        cls.expected_filtered = line_path(cls.path, cls.proxy_filter)[0]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def check(self):
+        # Small chunks so many lines straddle a chunk boundary
+        with mock.patch.object(proxy_checker, "BULK_CHUNK_BYTES", 4096):
+            self.assertEqual(bulk_path(self.path), self.expected)
+            self.assertEqual(bulk_path(self.path, self.proxy_filter)[0], self.expected_filtered)
+
+    @unittest.skipIf(proxy_checker.numpy is None, "NumPy is not installed")
+    def test_numpy(self):
+        self.check()
+
+    def test_without_numpy(self):
+        with mock.patch.object(proxy_checker, "numpy", None):
+            self.check()
+
+    def test_order_kept_around_unpacked_lines(self):
+        with open(os.path.join(self.directory.name, "order.txt"), "w") as f:
+            f.write("socks5://9.9.9.9:1080\n1.1.1.1:80\nexample.com:3128\n1.1.1.1:80\n2.2.2.2:81\n[::1]:8080\n")
+        for numpy in (proxy_checker.numpy, None):
+            with mock.patch.object(proxy_checker, "numpy", numpy):
+                self.assertEqual(list(load_proxy_file(f.name)), [
+                    "socks5://9.9.9.9:1080", "1.1.1.1:80", "example.com:3128", "1.1.1.1:80", "2.2.2.2:81", "[::1]:8080"
+                ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""FairQueue: weighted interleaving, and drop()/close() waking blocked callers"""
+import threading
+import time
+import unittest
+from collections import Counter
+from queue import Empty
+
+from proxy_checker import FairQueue, ProxySource
+
+
+def take(queue, count):
+    return [queue.get(timeout=1) for _ in range(count)]
+
+
+class FairQueueTest(unittest.TestCase):
+    def test_protocol_weights(self):
+        queue = FairQueue(weights={"http": 1, "socks4": 1, "socks5": 2})
+        for i in range(100):
+            for proto in ("http", "socks4", "socks5"):
+                queue.put((proto, f"1.2.3.4:{i + 1}"))
+        counts = Counter(proto for proto, _ in take(queue, 40))
+        self.assertEqual(counts, {"http": 10, "socks4": 10, "socks5": 20})
+
+    def test_source_weights(self):
+        queue = FairQueue()
+        sources = [ProxySource("http", f"{name}.txt", weight=weight) for name, weight in (("a", 1), ("b", 1), ("c", 2))]
+        for i in range(100):
+            for source in sources:
+                queue.put(("http", f"{source.location}:{i + 1}"), source)
+        counts = Counter(proxy.split(":")[0] for _, proxy in take(queue, 40))
+        self.assertEqual(counts, {"a.txt": 10, "b.txt": 10, "c.txt": 20})
+
+    def test_interleaves_instead_of_draining_one_protocol(self):
+        queue = FairQueue(weights={"http": 1, "socks5": 2})
+        for i in range(10):
+            queue.put(("http", f"1.2.3.4:{i + 1}"))
+        for i in range(10):
+            queue.put(("socks5", f"1.2.3.4:{i + 1}"))
+        # Every window of three holds one http and two socks5 items
+        protos = [proto for proto, _ in take(queue, 15)]
+        for start in range(0, 15, 3):
+            self.assertEqual(sorted(protos[start:start + 3]), ["http", "socks5", "socks5"])
+
+    def test_drop_releases_blocked_producer(self):
+        queue = FairQueue(lane_size=2)
+        queue.put(("http", "1.2.3.4:1"))
+        queue.put(("http", "1.2.3.4:2"))
+        producer = threading.Thread(target=queue.put, args=(("http", "1.2.3.4:3"),), daemon=True)
+        producer.start()
+        producer.join(0.2)
+        self.assertTrue(producer.is_alive(), "put() should block on a full lane")
+        self.assertEqual(queue.drop("http"), 2)
+        producer.join(1)
+        self.assertFalse(producer.is_alive())
+        # The released item was refused, and later puts are too
+        queue.put(("http", "1.2.3.4:4"))
+        self.assertEqual(queue.size, 0)
+        self.assertRaises(Empty, queue.get, 0.05)
+
+    def test_close_wakes_all_consumers(self):
+        queue = FairQueue()
+        results = []
+        consumers = [threading.Thread(target=lambda: results.append(queue.get(timeout=5)), daemon=True) for _ in range(4)]
+        for consumer in consumers:
+            consumer.start()
+        time.sleep(0.1)
+        queue.close()
+        for consumer in consumers:
+            consumer.join(1)
+            self.assertFalse(consumer.is_alive())
+        self.assertEqual(results, [None] * 4)
+
+    def test_close_drains_first(self):
+        queue = FairQueue()
+        queue.put(("http", "1.2.3.4:1"))
+        queue.close()
+        self.assertEqual(queue.get(timeout=1), ("http", "1.2.3.4:1"))
+        self.assertIsNone(queue.get(timeout=1))
+
+
+if __name__ == "__main__":
+    unittest.main()